@@ -1,128 +1,550 @@
-import decimal
 import os
+import codecs
 import functools
+import hashlib
+import io
+import itertools
+import json as std_json
+import mmap
 import re
 import subprocess
 import shutil
-import webbrowser
+import tempfile
+import threading
+import time
 from xml.etree import ElementTree as et
 
 import sublime
 import sublime_plugin
 
+from .lib import jqlite
+from .lib import json2xml
+from .lib.selection import select_spans
 from .lib import simplejson as json
 from .lib.simplejson import OrderedDict
 
 
-PREVIOUS_CONTENT = [str(), str()]
-PREVIOUS_QUERY_LEN = int()
-
 xml_syntax = "Packages/XML/XML.sublime-syntax"
 json_syntax = "Packages/JSON/JSON.sublime-syntax"
 
+# The standard library json module ships a C scanner and encoder, while the
+# bundled simplejson is pure Python. Documents are routed to json whenever it
+# supports everything the command needs.
+STD_JSON_ACCELERATED = (
+    std_json.scanner.c_make_scanner is not None
+    and std_json.encoder.c_make_encoder is not None
+)
 
-def get_jq_path():
-    settings = sublime.load_settings("Pretty JSON.sublime-settings")
-    return shutil.which(settings.get("jq_binary", "jq"))
 
+class SimplejsonRequired(Exception):
+    """Raised by the json encoder when it meets a raw number"""
 
-class PrettyJsonBaseCommand:
-    phantom_set = sublime.PhantomSet
-    phantoms = list()
-    force_sorting = False
-    json_char_matcher = re.compile(r"char (\d+)")
-    brace_newline = re.compile(r'^(^([ \t]*)(\"[^\"]*\"):)\s*([{])', re.MULTILINE)
-    bracket_newline = re.compile(r'^(^([ \t]*)(\"[^\"]*\"):)\s*([\[])', re.MULTILINE)
 
-    @staticmethod
-    def json_loads(selection: str, object_pairs_hook=OrderedDict):
-        return json.loads(
-            selection, object_pairs_hook=object_pairs_hook, parse_float=decimal.Decimal
+def require_simplejson(obj):
+    if isinstance(obj, json.RawJSON):
+        raise SimplejsonRequired()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def join_chunks(chunks, size: int):
+    """Regroup an iterable of strings into strings of at least size characters"""
+    buffer = list()
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer)
+            buffer = list()
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+class JobCancelled(Exception):
+    """Raised on the worker thread once the running job was cancelled"""
+
+
+class PrettyJsonJob:
+    """
+    A command running on the worker thread for one view. Its output is only
+    written if the view did not change in the meantime.
+    """
+
+    def __init__(self, command, tasks):
+        self.command = command
+        self.view = command.view
+        self.tasks = tasks
+        self.entire_file = any(entire_file for _, entire_file, _ in tasks)
+        self.change_count = self.view.change_count()
+        self.cancelled = False
+        self.output = list()
+        self.errors = list()
+        self.settings = get_settings()
+
+    def collect(self, chunks):
+        """
+        Encode chunks on the worker thread into blocks of CHUNK_SIZE
+        characters, stopping if cancelled
+        """
+        output = list()
+        length = 0
+        for chunk in join_chunks(self.check_cancelled(chunks), CHUNK_SIZE):
+            output.append(chunk)
+            length += len(chunk)
+            sublime.status_message(
+                f"Pretty JSON: {self.command.job_name}, {length / 1048576:.1f} MB"
+            )
+        return output
+
+    def check_cancelled(self, chunks):
+        for chunk in chunks:
+            if self.cancelled:
+                raise JobCancelled()
+            yield chunk
+
+
+# Running jobs by view id
+JOBS = dict()
+
+# Characters of output encoded between two progress reports
+CHUNK_SIZE = 1048576
+
+
+class LRUCache:
+    """
+    Least recently used cache bounded by the total size of its values,
+    as measured by sizeof. Safe to use from the worker thread.
+    """
+
+    def __init__(self, sizeof=len):
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def put(self, key, value, max_size: int):
+        size = self.sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            if size > max_size:
+                return
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > max_size:
+                self.size -= self.entries.popitem(last=False)[1][1]
+
+    def discard(self, predicate):
+        """Removes the entries whose key matches predicate"""
+        with self.lock:
+            for key in [key for key in self.entries if predicate(key)]:
+                self.size -= self.entries.pop(key)[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> str:
+        return (
+            f"{len(self.entries)} entries, {self.size / 1048576:.1f} MB, "
+            f"{self.hits} hits, {self.misses} misses"
         )
 
-    @staticmethod
-    def json_dumps(obj, minified: bool = False, force_sorting: bool = False) -> str:
-        settings = sublime.load_settings("Pretty JSON.sublime-settings")
 
-        sort_keys = settings.get("sort_keys", False)
-        if force_sorting:
-            sort_keys = True
+# Parsed documents by (view id, region begin, region end, keys located), each
+# entry is (change count, duplicates checked, parsed with, document, error, size)
+PARSE_CACHE = LRUCache(sizeof=lambda entry: entry[5])
+
+# Memory taken by a document decoded into OrderedDict and RawJSON, per
+# character of its text, as measured with tracemalloc on formatted and
+# minified documents: 7-10 times the text, 17 with located keys
+TREE_SIZE_FACTOR = 10
+LOCATED_TREE_SIZE_FACTOR = 20
+
+# Filter results by (content fingerprint, filter)
+JQ_CACHE = LRUCache(sizeof=lambda result: len(result[0]) + len(result[1]))
+
+
+# Settings read by the commands and listeners, with their defaults
+SETTINGS_DEFAULTS = {
+    "abort_format_on_duplicate_key": False,
+    "as_json": ["JSON"],
+    "brace_newline": True,
+    "bracket_newline": True,
+    "ensure_ascii": False,
+    "goto_symbol_max_depth": 10,
+    "goto_symbol_page_size": 10000,
+    "indent": 2,
+    "jq_binary": "jq",
+    "jq_cache_size": 64,
+    "jq_debounce_delay": 200,
+    "jq_errors": False,
+    "jq_preview_max_bytes": 16777216,
+    "json_backend": "auto",
+    "keep_arrays_single_line": False,
+    "line_separator": ",",
+    "max_arrays_line_length": 120,
+    "parse_cache_size": 256,
+    "pretty_on_save": False,
+    "reindent_block": False,
+    "set_syntax_on_format": True,
+    "sort_keys": False,
+    "use_entire_file_if_no_selection": True,
+    "validate_on_save": True,
+    "validate_while_typing": False,
+    "validate_while_typing_delay": 500,
+    "validate_while_typing_max_size": 20971520,
+    "validate_file_max_errors": 100,
+    "value_separator": ": ",
+}
+
+
+class PrettyJsonSettings:
+    """
+    Read-only snapshot of the package settings. A new one replaces it
+    whenever the settings change, so a command holding it neither looks
+    settings up again nor sees them change half way.
+    """
+
+    __slots__ = tuple(SETTINGS_DEFAULTS) + ("encoders",)
+
+    def __init__(self, settings):
+        for name, default in SETTINGS_DEFAULTS.items():
+            object.__setattr__(self, name, settings.get(name, default))
+        # simplejson encoders by (minified, force_sorting)
+        object.__setattr__(self, "encoders", dict())
 
-        line_separator = settings.get("line_separator", ",")
-        value_separator = settings.get("value_separator", ": ")
+    def __setattr__(self, name, value):
+        raise AttributeError("settings snapshots are read-only")
+
+    def dumps_options(self, minified: bool = False, force_sorting: bool = False) -> dict:
+        line_separator = self.line_separator
+        value_separator = self.value_separator
         if minified:
             line_separator = line_separator.strip()
             value_separator = value_separator.strip()
 
-        output_json = json.dumps(
-            obj,
-            indent=None if minified else settings.get("indent", 2),
-            ensure_ascii=settings.get("ensure_ascii", False),
-            sort_keys=sort_keys,
+        keep_arrays_single_line = self.keep_arrays_single_line
+        return dict(
+            indent=None if minified else self.indent,
+            ensure_ascii=self.ensure_ascii,
+            sort_keys=force_sorting or self.sort_keys,
             separators=(line_separator, value_separator),
-            use_decimal=True,
+            array_line_length=self.max_arrays_line_length
+            if keep_arrays_single_line
+            else None,
+            object_on_newline=self.brace_newline,
+            array_on_newline=not keep_arrays_single_line
+            and self.bracket_newline,
         )
-        if minified:
-            return output_json
-
-        if settings.get("keep_arrays_single_line", False):
-            matches = re.findall(r"(\[[^\[\]]+?\])", output_json)
-            matches.sort(key=len, reverse=True)
-            join_separator = line_separator.ljust(2)
-            for m in matches:
-                content = m[1:-1].strip()
-                items = [a.strip() for a in content.split(os.linesep)]
-                items = [item[:-1] if item[-1] == "," else item for item in items]
-                replacement = "["
-                for index, item in enumerate(items):
-                    if item in ('{', '}') or item.endswith("{") or item.startswith("}"):
-                        replacement = replacement + item
-                        if item == '}':
-                            if index != len(items)-1 and items[index+1] != "}":
-                                replacement = replacement + ','
-                    else:
-                        replacement = replacement + item
-                        if index != len(items)-1:
-                            if items[index+1] != '}':
-                                replacement = replacement + ','
-                replacement = replacement + ']'
-
-                if len(replacement) <= settings.get("max_arrays_line_length", 120):
-                    output_json = output_json.replace(m, replacement, 1)
-
-        elif settings.get("bracket_newline", True):
-            output_json = PrettyJsonBaseCommand.bracket_newline.sub(
-                r"\1\n\2\4", output_json
-            )
 
-        if settings.get("brace_newline", True):
-            output_json = PrettyJsonBaseCommand.brace_newline.sub(
-                r"\1\n\2\4", output_json
-            )
+    def encoder(self, minified: bool = False, force_sorting: bool = False):
+        """The simplejson encoder writing with these settings"""
+        key = (minified, force_sorting)
+        encoder = self.encoders.get(key)
+        if encoder is None:
+            encoder = json.get_encoder(**self.dumps_options(minified, force_sorting))
+            self.encoders[key] = encoder
+        return encoder
 
-        return output_json
 
-    @staticmethod
-    def get_selection_from_region(
-        region: sublime.Region, regions_length: int, view: sublime.View
-    ):
-        settings = sublime.load_settings("Pretty JSON.sublime-settings")
-        entire_file = False
-        if region.empty() and regions_length > 1:
-            return None, None
-        elif region.empty() and settings.get("use_entire_file_if_no_selection", True):
-            region = sublime.Region(0, view.size())
-            entire_file = True
+SETTINGS = None
 
-        return region, entire_file
 
-    def reindent(self, text: str, selection: sublime.Region):
+def get_settings() -> PrettyJsonSettings:
+    """The current settings snapshot"""
+    global SETTINGS
+    if SETTINGS is None:
         settings = sublime.load_settings("Pretty JSON.sublime-settings")
+        # a reloaded plugin replaces the callback of the previous one
+        settings.clear_on_change("pretty_json_snapshot")
+        settings.add_on_change("pretty_json_snapshot", refresh_settings)
+        SETTINGS = PrettyJsonSettings(settings)
+    return SETTINGS
+
+
+def refresh_settings():
+    global SETTINGS
+    SETTINGS = PrettyJsonSettings(sublime.load_settings("Pretty JSON.sublime-settings"))
+
+
+def get_jq_path():
+    return shutil.which(get_settings().jq_binary)
+
+
+class PrettyJsonBaseCommand:
+    phantom_set = sublime.PhantomSet
+    phantoms = list()
+    force_sorting = False
+    parsed_with = None
+    encoded_with = None
+    job_name = None
+    json_char_matcher = re.compile(r"char (\d+)")
+
+    def use_std_json(self, settings: PrettyJsonSettings = None) -> bool:
+        backend = (settings or get_settings()).json_backend
+        if backend == "auto":
+            return STD_JSON_ACCELERATED
+        return backend == "json"
+
+    def json_loads(
+        self,
+        selection: str,
+        object_pairs_hook=OrderedDict,
+        locate_keys: bool = False,
+        settings: PrettyJsonSettings = None,
+    ):
+        self.encoded_with = None
+        # json refuses a leading byte order mark, simplejson skips it;
+        # only simplejson records where keys are
+        if self.use_std_json(settings) and not selection.startswith("\ufeff") and not locate_keys:
+            try:
+                obj = json.get_decoder(
+                    cls=std_json.JSONDecoder,
+                    object_pairs_hook=object_pairs_hook,
+                    parse_float=json.RawJSON,
+                ).decode(selection)
+                self.parsed_with = "json"
+                return obj
+            except RecursionError:
+                pass
+
+        self.parsed_with = "simplejson"
+        # one decoder for every document parsed with the same options,
+        # rather than one per line of JSON Lines
+        return json.get_decoder(
+            cls=json.FastJSONDecoder,
+            object_pairs_hook=object_pairs_hook,
+            parse_float=json.RawJSON,
+            locate_keys=locate_keys,
+        ).decode(selection)
+
+    def dumps_options(
+        self, minified: bool = False, force_sorting: bool = False, settings: PrettyJsonSettings = None
+    ) -> dict:
+        return (settings or get_settings()).dumps_options(minified, force_sorting)
+
+    def json_iterdumps(
+        self, obj, minified: bool = False, force_sorting: bool = False, settings: PrettyJsonSettings = None
+    ):
+        settings = settings or get_settings()
+
+        # Only minified output is written by json's C encoder; the layout
+        # options and raw numbers need simplejson
+        if minified and self.use_std_json(settings):
+            options = settings.dumps_options(minified, force_sorting)
+            try:
+                output_json = json.get_encoder(
+                    cls=std_json.JSONEncoder,
+                    ensure_ascii=options["ensure_ascii"],
+                    sort_keys=options["sort_keys"],
+                    separators=options["separators"],
+                    default=require_simplejson,
+                ).encode(obj)
+                self.encoded_with = "json"
+                return iter((output_json,))
+            except SimplejsonRequired:
+                pass
+
+        self.encoded_with = "simplejson"
+        return settings.encoder(minified, force_sorting).iterencode(obj)
+
+    def json_raw_decode(self, selection: str, index: int, object_pairs_hook=OrderedDict):
+        """decodes the value starting at index, returns it and the index after it"""
+        decoder = json.get_decoder(
+            cls=std_json.JSONDecoder if self.use_std_json() else json.FastJSONDecoder,
+            object_pairs_hook=object_pairs_hook,
+            parse_float=json.RawJSON,
+        )
+        return decoder.raw_decode(selection, index)
+
+    def parse_region(
+        self,
+        region: sublime.Region,
+        selection: str,
+        change_count: int,
+        check_duplicates: bool = False,
+        locate_keys: bool = False,
+        settings: PrettyJsonSettings = None,
+        cache: bool = True,
+    ):
+        """
+        json_loads the text of region, reusing the document parsed by any
+        command for the same region as long as the view did not change.
+        Without cache the parsed document is not kept for other commands.
+        """
+        settings = settings or get_settings()
+        key = (self.view.id(), region.begin(), region.end(), locate_keys)
+        entry = PARSE_CACHE.get(key)
+        if entry is not None and entry[0] == change_count and (entry[1] or not check_duplicates):
+            _, _, parsed_with, document, error, _ = entry
+            self.parsed_with = f"{parsed_with}, cached"
+            self.encoded_with = None
+            if error is not None:
+                raise error
+            return document
+
+        document = error = None
+        try:
+            if check_duplicates:
+                document = self.json_loads(selection, self.duplicate_key_hook, locate_keys, settings)
+            else:
+                document = self.json_loads(selection, locate_keys=locate_keys, settings=settings)
+        except Exception as ex:
+            # the traceback would keep the parser's frames alive in the cache
+            error = ex.with_traceback(None)
+        if cache:
+            # the error only keeps the text
+            size = len(selection)
+            if document is not None:
+                size *= LOCATED_TREE_SIZE_FACTOR if locate_keys else TREE_SIZE_FACTOR
+            PARSE_CACHE.put(
+                key,
+                (change_count, check_duplicates, self.parsed_with, document, error, size),
+                settings.parse_cache_size * 1048576,
+            )
+        if error is not None:
+            raise error
+        return document
+
+    def json_dumps(
+        self, obj, minified: bool = False, force_sorting: bool = False, settings: PrettyJsonSettings = None
+    ) -> str:
+        return "".join(self.json_iterdumps(obj, minified, force_sorting, settings))
+
+    def can_reformat(
+        self, minified: bool = False, force_sorting: bool = False, settings: PrettyJsonSettings = None
+    ) -> bool:
+        """Whether the text can be re-indented token by token, without
+        decoding it into Python objects"""
+        options = self.dumps_options(minified, force_sorting, settings)
+        return not options["sort_keys"] and options["array_line_length"] is None
+
+    def json_iterreformat(self, selection: str, minified: bool = False, settings: PrettyJsonSettings = None):
+        options = self.dumps_options(minified, settings=settings)
+        del options["sort_keys"], options["array_line_length"]
+        self.parsed_with = self.encoded_with = "simplejson reformatter"
+        return json.iterreformat(selection, **options)
+
+    def write_chunks(self, edit, region: sublime.Region, chunks):
+        """
+        Replace region with the text of chunks, inserting them one by one
+        after the region and erasing the region once all of them are written,
+        so the output is never joined into one more string.
+        If chunks raises, the partial output is removed and the region is
+        left untouched.
+        """
+        start = end = region.end()
+        try:
+            for chunk in chunks:
+                end += self.view.insert(edit, end, chunk)
+        except Exception:
+            self.view.erase(edit, sublime.Region(start, end))
+            raise
+        self.view.erase(edit, sublime.Region(region.begin(), start))
+
+    def start_job(self, edit, background: bool = True):
+        """
+        Call process_region for every selected region on the worker thread,
+        then write what it returned and call job_done on the main thread
+        """
+        settings = get_settings()
+        self.clear_phantoms()
+        tasks = list()
+        spans = select_spans(
+            ((region.begin(), region.end()) for region in self.view.sel()),
+            self.view.size(),
+            settings.use_entire_file_if_no_selection,
+        )
+        for begin, end, entire_file in spans:
+            region = sublime.Region(begin, end)
+            tasks.append((region, entire_file, self.view.substr(region)))
+        if not tasks:
+            # only cursors, and the whole file is not used without a selection
+            return
+
+        job = PrettyJsonJob(self, tasks)
+        if not background:
+            self.run_job(job)
+            self.apply_job(edit, job)
+            return
+
+        if self.view.id() in JOBS:
+            sublime.status_message("Pretty JSON: a job is already running on this view")
+            return
+        JOBS[self.view.id()] = job
+        sublime.set_timeout_async(functools.partial(self.run_job, job, True))
+
+    def run_job(self, job: PrettyJsonJob, background: bool = False):
+        try:
+            for region, entire_file, selection_text in job.tasks:
+                try:
+                    output = self.process_region(job, region, entire_file, selection_text)
+                except JobCancelled:
+                    raise
+                except Exception as ex:
+                    job.errors.append((region, ex))
+                    continue
+                if output is not None:
+                    job.output.append((region, output))
+        except JobCancelled:
+            pass
+
+        if background:
+            sublime.set_timeout(functools.partial(self.finish_job, job))
+
+    def finish_job(self, job: PrettyJsonJob):
+        if job.view.is_valid():
+            job.view.run_command("pretty_json_apply", {"job_id": id(job)})
+        else:
+            JOBS.pop(job.view.id(), None)
+
+    def apply_job(self, edit, job: PrettyJsonJob):
+        for region, ex in job.errors:
+            self.show_exception(region=region, msg=ex)
+        # Later regions first so the earlier ones keep their offsets
+        for region, chunks in sorted(job.output, key=lambda output: output[0].begin(), reverse=True):
+            self.write_chunks(edit, region, chunks)
+        self.job_done(job)
+
+    def process_region(self, job: PrettyJsonJob, region: sublime.Region, entire_file: bool, selection_text: str):
+        """Runs on the worker thread, returns the chunks replacing region or None"""
+        raise NotImplementedError
+
+    def job_done(self, job: PrettyJsonJob):
+        pass
+
+    def show_backends(self, message: str):
+        if self.parsed_with is None:
+            sublime.status_message(message)
+            return
+        backends = f"parsed with {self.parsed_with}"
+        if self.encoded_with == self.parsed_with:
+            backends = f"with {self.parsed_with}"
+        elif self.encoded_with:
+            backends += f", encoded with {self.encoded_with}"
+        sublime.status_message(f"{message} ({backends})")
+
+    def reindent_space(self, selection: sublime.Region, settings: PrettyJsonSettings = None) -> str:
+        settings = settings or get_settings()
         current_line = self.view.line(selection.begin())
         text_before_sel = sublime.Region(current_line.begin(), selection.begin())
         indent_space = ""
 
-        reindent_mode = settings.get("reindent_block", False)
+        reindent_mode = settings.reindent_block
         if reindent_mode == "start":
             space_number = text_before_sel.size()
             indent_space = " " * space_number
@@ -131,6 +553,10 @@ class PrettyJsonBaseCommand:
                 0
             )
 
+        return indent_space
+
+    def reindent(self, text: str, selection: sublime.Region):
+        indent_space = self.reindent_space(selection)
         lines = text.split("\n")
 
         i = 1
@@ -140,23 +566,29 @@ class PrettyJsonBaseCommand:
 
         return "\n".join(lines)
 
+    def reindent_chunks(self, chunks, selection: sublime.Region, settings: PrettyJsonSettings = None):
+        newline = "\n" + self.reindent_space(selection, settings)
+        return (chunk.replace("\n", newline) for chunk in chunks)
+
     def show_exception(self, region: sublime.Region = None, msg=""):
         if region is None or region.empty():
             sublime.message_dialog(f"[Error]: {msg}")
             return
-        self.highlight_error(region=region, message=f"{msg}")
+        self.highlight_error(region=region, message=f"{msg}", offset=getattr(msg, "pos", None))
+
+    def collect_errors(self, selection: str, error: Exception) -> list:
+        """every syntax error and duplicate key of selection, which raised error"""
+        return json.scan_errors(selection, check_duplicates=True) or [error]
 
-    def highlight_error(self, region: sublime.Region, message: str):
+    def highlight_error(self, region: sublime.Region, message: str, scroll: bool = True, offset: int = None):
         self.phantom_set = sublime.PhantomSet(self.view, "json_errors")
 
-        char_match = self.json_char_matcher.search(message)
-        if char_match:
-            if region.a > region.b:
-                region.b += int(char_match.group(1))
-                region.a = region.b + 1
-            else:
-                region.a += int(char_match.group(1))
-                region.b = region.a + 1
+        if offset is None:
+            char_match = self.json_char_matcher.search(message)
+            if char_match:
+                offset = int(char_match.group(1))
+        if offset is not None:
+            region = sublime.Region(region.begin() + offset, region.begin() + offset + 1)
 
         self.phantoms.append(
             sublime.Phantom(
@@ -167,7 +599,12 @@ class PrettyJsonBaseCommand:
             )
         )
         self.phantom_set.update(self.phantoms)
-        self.view.show(region)
+        # the view and the status bar show the first error
+        if len(self.phantoms) > 1:
+            sublime.status_message(f"json_errors\t{len(self.phantoms)} errors")
+            return
+        if scroll:
+            self.view.show(region)
         sublime.status_message(f"json_errors\t{message}")
 
     # Description: Taken from
@@ -197,16 +634,19 @@ class PrettyJsonBaseCommand:
         self.phantom_set.update(self.phantoms)
 
     def syntax_to_json(self):
-        settings = sublime.load_settings("Pretty JSON.sublime-settings")
+        settings = get_settings()
         syntax = os.path.splitext(os.path.basename(self.view.settings().get("syntax")))[
             0
         ]
-        as_json = [i.lower() for i in settings.get("as_json", ["JSON"])]
-        if syntax.lower() not in as_json and settings.get("set_syntax_on_format", True):
+        as_json = [i.lower() for i in settings.as_json]
+        if syntax.lower() not in as_json and settings.set_syntax_on_format:
             self.view.set_syntax_file(json_syntax)
 
-    def duplicate_key_hook(self, pairs):
-        result = dict()
+    # static, so that decoders cached by their options do not keep a
+    # command and its view alive
+    @staticmethod
+    def duplicate_key_hook(pairs):
+        result = OrderedDict()
         for key, val in pairs:
             if key in result:
                 raise KeyError(f"Duplicate key specified: {key}")
@@ -215,23 +655,106 @@ class PrettyJsonBaseCommand:
 
 
 class PrettyJsonValidate(PrettyJsonBaseCommand, sublime_plugin.TextCommand):
-    def run(self, edit):
-        self.clear_phantoms()
-        regions = self.view.sel()
-        for region in regions:
-            region, _ = self.get_selection_from_region(
-                region=region, regions_length=len(region), view=self.view
+    job_name = "validating"
+
+    def run(self, edit, background=True):
+        self.start_job(edit, background)
+
+    def process_region(self, job, region, entire_file, selection_text):
+        try:
+            self.parse_region(
+                region, selection_text, job.change_count, check_duplicates=True, settings=job.settings
             )
-            if region is None:
-                continue
+        except Exception as ex:
+            # all errors at once rather than one per validation
+            job.errors.extend((region, error) for error in self.collect_errors(selection_text, ex))
 
-            try:
-                self.json_loads(self.view.substr(region), self.duplicate_key_hook)
-            except Exception as ex:
-                self.show_exception(region=region, msg=ex)
-                return
+    def job_done(self, job):
+        if not job.errors:
+            self.show_backends("JSON Valid")
+
+
+class PrettyJsonValidateFileCommand(sublime_plugin.WindowCommand):
+    """
+    Description: Validates a JSON or JSON Lines file on disk without
+    opening it, for files too large for a view
+    """
 
-            sublime.status_message("JSON Valid")
+    # The file being validated, only one at a time
+    path = None
+    cancelled = False
+
+    def run(self, path=None):
+        if PrettyJsonValidateFileCommand.path is not None:
+            # running the command again stops the validation
+            PrettyJsonValidateFileCommand.cancelled = True
+            sublime.status_message("Pretty JSON: cancelling file validation")
+            return
+        if path is not None:
+            self.start(path)
+            return
+        view = self.window.active_view()
+        initial = view.file_name() if view is not None else None
+        self.window.show_input_panel("Validate JSON file:", initial or "", self.start, None, None)
+
+    def start(self, path: str):
+        path = os.path.expanduser(path.strip())
+        if not path:
+            return
+        PrettyJsonValidateFileCommand.path = path
+        PrettyJsonValidateFileCommand.cancelled = False
+        sublime.set_timeout_async(functools.partial(self.validate, path))
+
+    def validate(self, path: str):
+        """Runs on the worker thread"""
+        settings = get_settings()
+        lines = os.path.splitext(path)[1].lower() in (".jsonl", ".jsonlines", ".ndjson")
+        name = os.path.basename(path)
+        try:
+            with open(path, "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                # empty files cannot be mapped
+                content = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+                def progress(pos):
+                    if PrettyJsonValidateFileCommand.cancelled:
+                        raise JobCancelled()
+                    sublime.status_message(f"Pretty JSON: validating {name}, {pos * 100 // size}%")
+
+                try:
+                    errors = json.scan_bytes_errors(
+                        content, settings.validate_file_max_errors, lines, progress
+                    )
+                finally:
+                    if size:
+                        content.close()
+        except JobCancelled:
+            sublime.status_message(f"Pretty JSON: validation of {name} cancelled")
+            return
+        except (OSError, ValueError) as ex:
+            sublime.status_message(f"Pretty JSON: cannot validate {name}: {ex}")
+            return
+        finally:
+            PrettyJsonValidateFileCommand.path = None
+
+        if not errors:
+            sublime.status_message(f"JSON Valid: {name}")
+        else:
+            sublime.set_timeout(functools.partial(self.show_errors, path, errors, settings))
+
+    def show_errors(self, path: str, errors: list, settings):
+        panel = self.window.create_output_panel("pretty_json_file")
+        # double clicking an error opens the file there
+        panel.settings().set("result_file_regex", r"^(.+):(\d+):(\d+): (.+)$")
+        report = [
+            f"{path}:{error.lineno}:{error.colno}: {error.msg.replace('%r', repr(error.char))}"
+            for error in errors
+        ]
+        if len(errors) >= settings.validate_file_max_errors:
+            report.append(f"Stopped after {len(errors)} errors")
+        panel.run_command("append", {"characters": "\n".join(report) + "\n"})
+        self.window.run_command("show_panel", {"panel": "output.pretty_json_file"})
+        sublime.status_message(f"Pretty JSON: {len(errors)} errors in {os.path.basename(path)}")
 
 
 class PrettyJsonCommand(PrettyJsonBaseCommand, sublime_plugin.TextCommand):
@@ -239,65 +762,60 @@ class PrettyJsonCommand(PrettyJsonBaseCommand, sublime_plugin.TextCommand):
     Description: Pretty Print JSON
     """
 
-    def run(self, edit):
-        settings = sublime.load_settings("Pretty JSON.sublime-settings")
+    job_name = "formatting"
 
-        self.clear_phantoms()
-        pos = self.view.viewport_position()
-        regions = self.view.sel()
-        for region in regions:
-            region, entire_file = self.get_selection_from_region(
-                region=region, regions_length=len(region), view=self.view
-            )
-            if region is None:
-                continue
+    def run(self, edit, background=True):
+        self.start_job(edit, background)
 
-            selection_text = self.view.substr(region)
-            try:
-                obj = {}
-                if settings.get("abort_format_on_duplicate_key", False):
-                    try:
-                        self.json_loads(selection_text, self.duplicate_key_hook)
-                    except Exception as ex:
-                        self.show_exception(region=region, msg=ex)
-                        return
-                else:
-                    obj = self.json_loads(selection_text)
-                json_text = self.json_dumps(obj=obj, minified=False, force_sorting=self.force_sorting)
-                if not entire_file and settings.get("reindent_block", False):
-                    json_text = self.reindent(json_text, region)
-
-                self.view.replace(edit, region, json_text)
-                if entire_file:
-                    self.syntax_to_json()
-
-            except Exception as ex:
-                try:
-                    count_single_quotes = re.findall(r"(\'[^\']+\'?)", selection_text)
-                    amount_of_double_quotes = re.findall(
-                        r"(\"[^\"]+\"?)", selection_text
-                    )
+    def process_region(self, job, region, entire_file, selection_text):
+        settings = job.settings
 
-                    if len(count_single_quotes) >= len(amount_of_double_quotes):
-                        modified_text = re.sub(
-                            r"(?:\'([^\']+)\'?)", r'"\1"', selection_text
-                        )
-                        obj = self.json_loads(modified_text)
-                        json_text = self.json_dumps(obj=obj, minified=False)
+        if settings.abort_format_on_duplicate_key:
+            obj = self.parse_region(
+                region, selection_text, job.change_count, check_duplicates=True, settings=settings
+            )
+            chunks = self.json_iterdumps(
+                obj=obj, minified=False, force_sorting=self.force_sorting, settings=settings
+            )
+            return job.collect(self.reindent_block(chunks, region, entire_file, settings))
 
-                        if not entire_file and settings.get("reindent_block", False):
-                            json_text = self.reindent(json_text, region)
+        try:
+            if self.can_reformat(force_sorting=self.force_sorting, settings=settings):
+                chunks = self.json_iterreformat(selection_text, settings=settings)
+            else:
+                obj = self.parse_region(region, selection_text, job.change_count, settings=settings)
+                chunks = self.json_iterdumps(
+                    obj=obj, minified=False, force_sorting=self.force_sorting, settings=settings
+                )
+            return job.collect(self.reindent_block(chunks, region, entire_file, settings))
+
+        except JobCancelled:
+            raise
+        except Exception:
+            count_single_quotes = re.findall(r"(\'[^\']+\'?)", selection_text)
+            amount_of_double_quotes = re.findall(
+                r"(\"[^\"]+\"?)", selection_text
+            )
+            if len(count_single_quotes) < len(amount_of_double_quotes):
+                raise
 
-                        pos = self.view.viewport_position()
-                        self.view.replace(edit, region, json_text)
-                        self.view.set_viewport_position(pos)
+            modified_text = re.sub(
+                r"(?:\'([^\']+)\'?)", r'"\1"', selection_text
+            )
+            obj = self.json_loads(modified_text, settings=settings)
+            chunks = self.json_iterdumps(obj=obj, minified=False, settings=settings)
+            return job.collect(self.reindent_block(chunks, region, entire_file, settings))
 
-                        if entire_file:
-                            self.syntax_to_json()
-                    else:
-                        self.show_exception(region=region, msg=ex)
-                except Exception as ex:
-                    self.show_exception(region=region, msg=ex)
+    def reindent_block(self, chunks, region, entire_file, settings):
+        if not entire_file and settings.reindent_block:
+            return self.reindent_chunks(chunks, region, settings)
+        return chunks
+
+    def job_done(self, job):
+        if job.entire_file and job.output:
+            self.syntax_to_json()
+        if not job.errors:
+            self.show_backends("JSON formatted")
 
 
 class PrettyJsonLinesCommand(PrettyJsonCommand, sublime_plugin.TextCommand):
@@ -306,59 +824,51 @@ class PrettyJsonLinesCommand(PrettyJsonCommand, sublime_plugin.TextCommand):
     Description: Pretty print json lines https://jsonlines.org
     """
 
-    def run(self, edit):
-        self.clear_phantoms()
-        regions = self.view.sel()
+    def process_region(self, job, region, entire_file, selection_text):
+        format_line = self.line_formatter(job.settings)
+        lines = selection_text.split("\n")
+        output = list()
         error_count = 0
-        for region in regions:
-            (selection, selected_entire_file,) = self.get_selection_from_region(
-                region=region, regions_length=len(regions), view=self.view
-            )
-            if selection is None:
-                continue
+        for line in job.check_cancelled(lines):
+            if error_count > 2:
+                job.errors.append((None, "Encountered to many errors. Aborting"))
+                return None
 
-            for jsonl in sorted(self.view.split_by_newlines(selection), reverse=True):
-                if error_count > 2:
-                    self.show_exception(msg="Encountered to many errors. Aborting")
-                    return
+            if line.strip() == "":
+                output.append(line)
+                continue
 
-                if self.view.substr(jsonl).strip() == "":
-                    continue
+            try:
+                output.append(format_line(line))
+            except Exception:
+                error_count += 1
+                try:
+                    amount_of_single_quotes = re.findall(r"(\'[^\']+\'?)", line)
+                    amount_of_double_quotes = re.findall(r"(\"[^\"]+\"?)", line)
 
-                if jsonl.empty() and len(jsonl) > 1:
-                    continue
+                    if len(amount_of_single_quotes) >= len(amount_of_double_quotes):
+                        line_modified = re.sub(r"(?:\'([^\']+)\'?)", r'"\1"', line)
+                        output.append(format_line(line_modified))
+                    else:
+                        output.append(line)
+                except Exception as ex:
+                    error_count += 1
+                    job.errors.append((None, ex))
+                    output.append(line)
 
-                selection_text = ""
-                try:
-                    selection_text = self.view.substr(jsonl)
-                    obj = self.json_loads(selection_text)
-                    self.view.replace(edit, jsonl, self.json_dumps(obj))
+        return job.collect(("\n".join(output),))
 
-                    if selected_entire_file:
-                        self.syntax_to_json()
+    def line_formatter(self, settings: PrettyJsonSettings):
+        """Return a function formatting one line with settings"""
+        if not self.can_reformat(settings=settings):
+            return lambda line: self.json_dumps(
+                self.json_loads(line, settings=settings), settings=settings
+            )
 
-                except Exception:
-                    error_count += 1
-                    try:
-                        amount_of_single_quotes = re.findall(
-                            r"(\'[^\']+\'?)", selection_text
-                        )
-                        amount_of_double_quotes = re.findall(
-                            r"(\"[^\"]+\"?)", selection_text
-                        )
-
-                        if len(amount_of_single_quotes) >= len(amount_of_double_quotes):
-                            selection_text_modified = re.sub(
-                                r"(?:\'([^\']+)\'?)", r'"\1"', selection_text
-                            )
-                            obj = self.json_loads(selection_text_modified)
-                            self.view.replace(edit, jsonl, self.json_dumps(obj))
-
-                            if selected_entire_file:
-                                self.syntax_to_json()
-                    except Exception as ex:
-                        error_count += 1
-                        self.show_exception(msg=ex)
+        options = self.dumps_options(settings=settings)
+        del options["sort_keys"], options["array_line_length"]
+        self.parsed_with = self.encoded_with = "simplejson reformatter"
+        return functools.partial(json.reformat, **options)
 
 
 class PrettyJsonAndSortCommand(PrettyJsonCommand, sublime_plugin.TextCommand):
@@ -366,10 +876,7 @@ class PrettyJsonAndSortCommand(PrettyJsonCommand, sublime_plugin.TextCommand):
     Description: Pretty print json with forced sorting
     """
 
-    def run(self, edit):
-        self.force_sorting = True
-        PrettyJsonCommand.run(self, edit)
-        self.force_sorting = False
+    force_sorting = True
 
 
 class UnPrettyJsonCommand(PrettyJsonBaseCommand, sublime_plugin.TextCommand):
@@ -377,25 +884,61 @@ class UnPrettyJsonCommand(PrettyJsonBaseCommand, sublime_plugin.TextCommand):
     Description: Compress/minify JSON - it makes json as one-liner
     """
 
-    def run(self, edit):
-        self.clear_phantoms()
-        regions = self.view.sel()
-        for region in regions:
-            region, entire_file = self.get_selection_from_region(
-                region=region, regions_length=len(region), view=self.view
+    job_name = "minifying"
+
+    def run(self, edit, background=True):
+        self.start_job(edit, background)
+
+    def process_region(self, job, region, entire_file, selection_text):
+        if self.can_reformat(minified=True, settings=job.settings):
+            chunks = self.json_iterreformat(selection_text, minified=True, settings=job.settings)
+        else:
+            obj = self.parse_region(region, selection_text, job.change_count, settings=job.settings)
+            chunks = self.json_iterdumps(obj=obj, minified=True, settings=job.settings)
+        return job.collect(chunks)
+
+    def job_done(self, job):
+        if job.entire_file and job.output:
+            self.syntax_to_json()
+        if not job.errors:
+            self.show_backends("JSON minified")
+
+
+class PrettyJsonApplyCommand(sublime_plugin.TextCommand):
+    """
+    Description: Writes the output of a finished job, unless the view changed
+    while it was running
+    """
+
+    def run(self, edit, job_id):
+        job = JOBS.get(self.view.id())
+        if job is None or id(job) != job_id:
+            return
+        del JOBS[self.view.id()]
+
+        if job.cancelled:
+            sublime.status_message(f"Pretty JSON: {job.command.job_name} cancelled")
+        elif job.change_count != self.view.change_count():
+            sublime.status_message(
+                f"Pretty JSON: {job.command.job_name} discarded, the view changed meanwhile"
             )
-            if region is None:
-                continue
+        else:
+            job.command.apply_job(edit, job)
 
-            try:
-                obj = self.json_loads(self.view.substr(region))
-                self.view.replace(edit, region, self.json_dumps(obj=obj, minified=True))
 
-                if entire_file:
-                    self.syntax_to_json()
+class PrettyJsonCancelCommand(sublime_plugin.TextCommand):
+    """
+    Description: Cancels the job running on the view
+    """
 
-            except Exception as ex:
-                self.show_exception(region=region, msg=ex)
+    def is_enabled(self):
+        return self.view.id() in JOBS
+
+    def run(self, edit):
+        job = JOBS.get(self.view.id())
+        if job is not None:
+            job.cancelled = True
+            sublime.status_message(f"Pretty JSON: cancelling {job.command.job_name}")
 
 
 class JqInsertPrettyJsonCommand(sublime_plugin.TextCommand):
@@ -405,6 +948,13 @@ class JqInsertPrettyJsonCommand(sublime_plugin.TextCommand):
         self.view.set_read_only(True)
 
 
+class JqAppendPrettyJsonCommand(sublime_plugin.TextCommand):
+    def run(self, edit, string):
+        self.view.set_read_only(False)
+        self.view.insert(edit, self.view.size(), string)
+        self.view.set_read_only(True)
+
+
 class JqPrettyJsonCommand(sublime_plugin.TextCommand):
     def run(self, edit):
         syntax_file = self.view.settings().get("syntax")
@@ -444,13 +994,13 @@ class JqPrettyJsonCommand(sublime_plugin.TextCommand):
         preview_view.set_syntax_file(syntax_file)
 
 
-class JqQueryPrettyJson(sublime_plugin.WindowCommand):
+class JqQueryPrettyJson(PrettyJsonBaseCommand, sublime_plugin.WindowCommand):
     """
     Description: ./jq integration
     """
 
     def is_enabled(self):
-        settings = sublime.load_settings("Pretty JSON.sublime-settings")
+        settings = get_settings()
 
         if not self.window:
             return
@@ -459,31 +1009,35 @@ class JqQueryPrettyJson(sublime_plugin.WindowCommand):
         if not view:
             return
 
-        as_json = settings.get("as_json", ["JSON"])
+        as_json = settings.as_json
         return any(syntax in view.settings().get("syntax", "") for syntax in as_json)
 
     def is_visible(self):
         return self.is_enabled()
 
+    query_id = 0
+    process = None
+    input_path = None
+    fingerprint = None
+    document = None
+    last_output = ""
+
     def run(self):
         jq_path = get_jq_path()
-        if jq_path:
-            preview_view = self.window.active_view()
-            preview_view.run_command("jq_pretty_json")
-            sublime.active_window().show_input_panel(
-                "Enter ./jq filter expression",
-                ".",
-                self.done,
-                functools.partial(self.send_query, jq_path),
-                None,
+        if not jq_path:
+            sublime.status_message(
+                "Pretty JSON: ./jq is not installed, only the built-in filters are available"
             )
-        else:
-            if sublime.ok_cancel_dialog(
-                    "./jq tool is not available on your system. Do you want to open the jq website?",
-                    "Open JQ Website"
-                ):
-                webbrowser.open("http://stedolan.github.io/jq")
-
+        preview_view = self.window.active_view()
+        self.start_session()
+        preview_view.run_command("jq_pretty_json")
+        sublime.active_window().show_input_panel(
+            "Enter ./jq filter expression",
+            ".",
+            self.done,
+            functools.partial(self.schedule_query, jq_path),
+            self.cancel,
+        )
 
     def get_content(self):
         """returns content of active view or selected region"""
@@ -499,111 +1053,316 @@ class JqQueryPrettyJson(sublime_plugin.WindowCommand):
                 selection = region
         return view.substr(selection)
 
-    def send_query(self, jq_path: str, query: str):
-        global PREVIOUS_CONTENT, PREVIOUS_QUERY_LEN
-        settings = sublime.load_settings("Pretty JSON.sublime-settings")
+    def start_session(self):
+        """writes the queried content to a temporary file jq reads for every query"""
+        self.end_session(self.input_path)
+
+        raw_json = self.get_content()
+        raw_bytes = bytes(raw_json, "UTF-8")
+        self.last_output = raw_json
+        self.fingerprint = hashlib.sha1(raw_bytes).hexdigest()
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as input_file:
+            input_file.write(raw_bytes)
+        self.input_path = input_file.name
+        self.document = None
+        sublime.set_timeout_async(functools.partial(self.load_document, raw_json, self.input_path))
+
+    def load_document(self, raw_json: str, input_path: str):
+        """parses the content once for the built-in filters"""
         try:
-            p = subprocess.Popen(
-                [jq_path, query],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdin=subprocess.PIPE,
-            )
-            QUERY_LEN = len(query)
-            raw_json = self.get_content()
-
-            if not PREVIOUS_CONTENT[0]:
-                PREVIOUS_CONTENT[0] = raw_json
-
-            if not PREVIOUS_CONTENT[1]:
-                PREVIOUS_CONTENT[1] = raw_json
-
-            out, err = p.communicate(bytes(raw_json, "UTF-8"))
-            output = out.decode("UTF-8").replace(os.linesep, "\n").strip()
-            errors = err.decode("UTF-8").replace(os.linesep, "\n").strip()
-            jq_view = sublime.active_window().active_view_in_group(1)
-
-            if output and output != "null":
-                if QUERY_LEN > PREVIOUS_QUERY_LEN:
-                    PREVIOUS_CONTENT[0] = PREVIOUS_CONTENT[1]
-                    PREVIOUS_CONTENT[1] = output
-                elif QUERY_LEN < PREVIOUS_QUERY_LEN:
-                    PREVIOUS_CONTENT[1] = PREVIOUS_CONTENT[0]
-                    PREVIOUS_CONTENT[0] = output
-                PREVIOUS_QUERY_LEN = len(query)
-            elif settings.get("jq_errors", False) and errors:
-                output = errors
-            else:
-                if PREVIOUS_QUERY_LEN <= QUERY_LEN:
-                    output = PREVIOUS_CONTENT[1]
-                else:
-                    output = PREVIOUS_CONTENT[0]
-            jq_view.run_command("jq_insert_pretty_json", {"string": output})
+            document = self.json_loads(raw_json)
+        except Exception:
+            # leave the error to ./jq
+            return
+        if input_path == self.input_path:
+            self.document = document
+
+    def run_builtin(self, query: str, query_id: int, max_bytes: int):
+        """
+        returns output, errors and whether the output is complete, or None if
+        ./jq is needed; results are encoded one by one until max_bytes are
+        reached, and JobCancelled is raised once a newer query replaced this one
+        """
+        if self.document is None:
+            return None
+        try:
+            plan = jqlite.compile(query)
+        except jqlite.UnsupportedQuery:
+            return None
 
-        except OSError as ex:
-            sublime.status_message(str(ex))
+        encoder = json.get_encoder(indent=2, separators=(",", ": "), ensure_ascii=False)
+        output = list()
+        length = 0
+        try:
+            for result in plan(self.document):
+                if output:
+                    output.append("\n")
+                    length += 1
+                for chunk in encoder.iterencode(result):
+                    if query_id != self.query_id:
+                        raise JobCancelled()
+                    output.append(chunk)
+                    length += len(chunk)
+                    if length > max_bytes:
+                        return "".join(output)[:max_bytes], "", False
+        except jqlite.JqError as ex:
+            return "", f"jq: error: {ex}", True
+        return "".join(output), "", True
+
+    def end_session(self, input_path: str):
+        if input_path is None or input_path != self.input_path:
+            return
+        self.query_id += 1
+        self.kill_query()
+        self.input_path = None
+        self.document = None
+        self.last_output = ""
+        try:
+            os.remove(input_path)
+        except OSError:
+            pass
+
+    def kill_query(self):
+        process = self.process
+        if process is not None and process.poll() is None:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    def schedule_query(self, jq_path: str, query: str):
+        """runs the query once typing paused, dropping the one still running"""
+        settings = get_settings()
+        self.query_id += 1
+        self.kill_query()
+
+        result = JQ_CACHE.get((self.fingerprint, query))
+        if result is not None:
+            self.show_result(*result)
+            return
 
-    def done(self):
-        global PREVIOUS_CONTENT
-        PREVIOUS_CONTENT = list()
+        sublime.set_timeout_async(
+            functools.partial(self.send_query, jq_path, query, self.query_id),
+            settings.jq_debounce_delay,
+        )
 
+    def send_query(self, jq_path: str, query: str, query_id: int):
+        settings = get_settings()
+        max_bytes = settings.jq_preview_max_bytes
+        if query_id != self.query_id:
+            return
 
-class JsonToXml(PrettyJsonBaseCommand, sublime_plugin.TextCommand):
-    """
-    Description: converts Json to XML
-    """
+        try:
+            complete = True
+            streamed = False
+            builtin = self.run_builtin(query, query_id, max_bytes)
+            if builtin is not None:
+                output, errors, complete = builtin
+            elif jq_path:
+                result = self.stream_query(jq_path, query, query_id, max_bytes)
+                if result is None:
+                    return
+                output, errors, complete, streamed = result
+            else:
+                complete = False
+                output = ""
+                errors = "This filter needs ./jq, see http://stedolan.github.io/jq"
+                sublime.status_message(f"Pretty JSON: {errors}")
+
+            if complete:
+                JQ_CACHE.put(
+                    (self.fingerprint, query),
+                    (output, errors),
+                    settings.jq_cache_size * 1048576,
+                )
+            elif output:
+                sublime.status_message(
+                    f"Pretty JSON: preview truncated at {max_bytes / 1048576:.1f} MB"
+                )
+            sublime.set_timeout(functools.partial(self.show_result, output, errors, streamed))
+
+        except JobCancelled:
+            # a newer keystroke replaced this query
+            return
+        except OSError as ex:
+            sublime.status_message(str(ex))
 
-    def run(self, edit):
-        settings = sublime.load_settings("Pretty JSON.sublime-settings")
+    def stream_query(self, jq_path: str, query: str, query_id: int, max_bytes: int):
+        """
+        runs ./jq and appends its output to the preview while it is read;
+        returns output, errors, whether the output is complete and whether it
+        was shown already, or None if a newer query replaced this one
+        """
+        p = subprocess.Popen(
+            [jq_path, query, self.input_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self.process = p
+        err = list()
+        stderr_reader = threading.Thread(target=lambda: err.append(p.stderr.read()))
+        stderr_reader.start()
 
-        self.clear_phantoms()
-        regions = self.view.sel()
-        for region in regions:
-            region, entire_file = self.get_selection_from_region(
-                region=region, regions_length=len(region), view=self.view
-            )
-            if region is None:
+        decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder("UTF-8")(errors="replace"), translate=True
+        )
+        output = list()
+        pending = list()
+        received = 0
+        truncated = False
+        shown = False
+        last_flush = time.monotonic()
+        while True:
+            data = p.stdout.read1(65536)
+            if received + len(data) > max_bytes:
+                data = data[: max_bytes - received]
+                truncated = True
+            received += len(data)
+            final = truncated or not data
+            text = decoder.decode(data, final)
+            output.append(text)
+            pending.append(text)
+            if final or query_id != self.query_id:
+                break
+
+            # nothing is shown until there is real output, so that a filter
+            # without any keeps the previous preview
+            if shown and time.monotonic() - last_flush < 0.1:
+                continue
+            if not shown and "".join(output).strip() in ("", "null"):
                 continue
+            sublime.set_timeout(
+                functools.partial(self.show_stream, query_id, "".join(pending), not shown)
+            )
+            pending = list()
+            shown = True
+            last_flush = time.monotonic()
 
+        if truncated or query_id != self.query_id:
+            # jq may still be writing to the pipe nobody reads any more, and
+            # self.process may already be the newer query's
             try:
-                h = json.loads(self.view.substr(region))
-                root = et.Element("root")
-                root = self.traverse(root, h)
+                p.kill()
+            except OSError:
+                pass
+        p.wait()
+        stderr_reader.join()
+        if query_id != self.query_id:
+            return None
+
+        if shown and pending:
+            sublime.set_timeout(
+                functools.partial(self.show_stream, query_id, "".join(pending), False)
+            )
+        output = "".join(output).strip()
+        errors = b"".join(err).decode("UTF-8").replace(os.linesep, "\n").strip()
+        return output, errors, not truncated, shown
 
-                xml_string = "<?xml version='1.0' encoding='UTF-8' ?>\n"
+    def show_stream(self, query_id: int, text: str, replace: bool):
+        if query_id != self.query_id:
+            return
+        jq_view = sublime.active_window().active_view_in_group(1)
+        if replace:
+            jq_view.run_command("jq_insert_pretty_json", {"string": text})
+        else:
+            jq_view.run_command("jq_append_pretty_json", {"string": text})
+
+    def show_result(self, output: str, errors: str, streamed: bool = False):
+        """shows the output in the preview, or the last output if there is none"""
+        settings = get_settings()
+        if output and output != "null":
+            self.last_output = output
+            if streamed:
+                return
+        elif settings.jq_errors and errors:
+            output = errors
+        else:
+            output = self.last_output
 
-                rtn = et.tostring(root, "utf-8")
-                if type(rtn) is bytes:
-                    rtn = rtn.decode("utf-8")
+        jq_view = sublime.active_window().active_view_in_group(1)
+        jq_view.run_command("jq_insert_pretty_json", {"string": output})
 
-                xml_string += rtn
-                if type(xml_string) is bytes:
-                    xml_string = xml_string.decode("utf-8")
+    def done(self, query: str):
+        settings = get_settings()
+        # let the last scheduled query finish before the input is removed
+        sublime.set_timeout_async(
+            functools.partial(self.end_session, self.input_path),
+            settings.jq_debounce_delay,
+        )
+
+    def cancel(self):
+        self.end_session(self.input_path)
 
-                if not entire_file and settings.get("reindent_block", False):
-                    xml_string = self.reindent(xml_string, region)
 
-                self.view.replace(edit, region, xml_string)
+class PrettyJsonJqCacheStatsCommand(sublime_plugin.WindowCommand):
+    """
+    Description: Shows how well the ./jq result cache works
+    """
 
-                if entire_file:
-                    self.syntax_to_xml()
+    def run(self, clear=False):
+        if clear:
+            JQ_CACHE.clear()
+        sublime.message_dialog(f"Pretty JSON jq cache: {JQ_CACHE.stats()}")
 
-            except Exception as ex:
-                self.show_exception(region=region, msg=ex)
+
+class JsonToXml(PrettyJsonBaseCommand, sublime_plugin.TextCommand):
+    """
+    Description: converts Json to XML
+    """
+
+    job_name = "converting to XML"
+
+    def run(self, edit, background=True):
+        self.start_job(edit, background)
+
+    def process_region(self, job, region, entire_file, selection_text):
+        settings = job.settings
+        reindent = not entire_file and settings.reindent_block
+
+        try:
+            chunks = json2xml.iterxml(selection_text)
+            return job.collect(self.reindent_chunks(chunks, region, settings) if reindent else chunks)
+        except json2xml.UnsupportedDocument:
+            # namespaced keys are declared on the root, which takes the whole
+            # tree; ElementTree raises for other keys starting with {
+            chunks = self.tree_to_xml(selection_text)
+            return job.collect(self.reindent_chunks(chunks, region, settings) if reindent else chunks)
+
+    def tree_to_xml(self, selection_text: str):
+        h = json.loads(selection_text)
+        root = et.Element("root")
+        root = self.traverse(root, h)
+
+        rtn = et.tostring(root, "utf-8")
+        if type(rtn) is bytes:
+            rtn = rtn.decode("utf-8")
+        return iter((json2xml.XML_DECLARATION, rtn))
+
+    def job_done(self, job):
+        if job.entire_file and job.output:
+            self.syntax_to_xml()
 
     def traverse(self, element, json_dict):
-        """recursive traverse through dict and build xml tree"""
-        if type(json_dict) is dict and json_dict.keys():
-            for i in json_dict.keys():
-                e = et.Element(i)
-                element.append(self.traverse(e, json_dict[i]))
-        elif type(json_dict) is list:
-            e_items = et.Element("items")
-            for i in json_dict:
-                e_items.append(self.traverse(et.Element("item"), i))
-            element.append(e_items)
-        else:
-            element.set("value", str(json_dict))
+        """traverse through dict and build xml tree"""
+        # children are appended in order and filled in later, so deep
+        # documents do not run into the recursion limit
+        stack = [(element, json_dict)]
+        while stack:
+            parent, value = stack.pop()
+            if type(value) is dict and value.keys():
+                for i in value.keys():
+                    e = et.Element(i)
+                    parent.append(e)
+                    stack.append((e, value[i]))
+            elif type(value) is list:
+                e_items = et.Element("items")
+                for i in value:
+                    e = et.Element("item")
+                    e_items.append(e)
+                    stack.append((e, i))
+                parent.append(e_items)
+            else:
+                parent.set("value", str(value))
 
         return element
 
@@ -612,51 +1371,112 @@ class JsonToXml(PrettyJsonBaseCommand, sublime_plugin.TextCommand):
 
 
 class PrettyJsonGotoSymbolCommand(PrettyJsonBaseCommand, sublime_plugin.TextCommand):
+    more_item = "… more symbols"
+
     def run(self, edit):
-        self.items = list()
-        self.goto_items = list()
+        region = sublime.Region(0, self.view.size())
+        content = self.view.substr(region)
+        sublime.status_message("Pretty JSON: listing symbols")
+        sublime.set_timeout_async(
+            functools.partial(self.load_symbols, region, content, self.view.change_count())
+        )
 
-        content = self.view.substr(sublime.Region(0, self.view.size()))
+    def load_symbols(self, region: sublime.Region, content: str, change_count: int):
         try:
-            json_data = self.json_loads(content)
-            self.generate_items(json_data, "")
-            sublime.active_window().show_quick_panel(self.items, self.goto)
+            json_data = self.parse_region(region, content, change_count, locate_keys=True)
         except Exception as ex:
             self.show_exception(region=None, msg=ex)
+            return
+        self.list_symbols(json_data, "")
 
-    def generate_items(self, json_data, root_key):
+    def list_symbols(self, json_data, root_key: str, heading=None):
+        """Runs on the worker thread, opens a panel with the first page of symbols"""
+        settings = get_settings()
+        self.items = list()
+        self.goto_items = list()
+        self.deeper = dict()
+        if heading is not None:
+            self.items.append(heading[0])
+            self.goto_items.append(heading[1])
+        self.symbols = self.generate_items(
+            json_data, root_key, settings.goto_symbol_max_depth
+        )
+        self.next_page()
+
+    def next_page(self):
+        """Runs on the worker thread, opens the panel with one more page of symbols"""
+        settings = get_settings()
+        page_size = settings.goto_symbol_page_size
+        selected = len(self.goto_items)
+
+        page = list(itertools.islice(self.symbols, page_size + 1))
+        more = len(page) > page_size
+        if more:
+            self.symbols = itertools.chain((page.pop(),), self.symbols)
+        for item, goto_item, deeper in page:
+            if deeper is not None:
+                self.deeper[len(self.goto_items)] = (item, goto_item, deeper)
+                item += " …"
+            self.items.append(item)
+            self.goto_items.append(goto_item)
+
+        items = self.items + [self.more_item] if more else list(self.items)
+        sublime.set_timeout(
+            lambda: sublime.active_window().show_quick_panel(items, self.goto, 0, selected)
+        )
+
+    def generate_items(self, json_data, root_key: str, max_depth: int):
+        """
+        Yields the label, the place to go to and, for keys holding symbols
+        deeper than max_depth levels, what to list once they are picked
+        """
+        stack = [self.child_items(json_data, root_key)]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+                continue
+            item, goto_item, value, name = child
+            if not self.has_symbols(value):
+                yield item, goto_item, None
+            elif max_depth and len(stack) >= max_depth:
+                yield item, goto_item, (value, name)
+            else:
+                yield item, goto_item, None
+                stack.append(self.child_items(value, name))
+
+    @staticmethod
+    def child_items(json_data, root_key: str):
+        # keys and string items were decoded with their offsets
         if isinstance(json_data, OrderedDict):
-            for key in json_data:
-                new_key_name = f"{root_key}.{key}"
-                self.items.append(f'"{new_key_name}"')
-                self.goto_items.append(f'"{key}"')
-                self.generate_items(json_data[key], new_key_name)
+            for key, value in json_data.items():
+                name = f"{root_key}.{key}"
+                yield f'"{name}"', sublime.Region(key.offset, key.end), value, name
         elif isinstance(json_data, list):
-            for index, item in enumerate(json_data):
+            for item in json_data:
                 if isinstance(item, str):
-                    self.items.append(f"{root_key}.{item}")
-                    self.goto_items.append(f'"{item}"')
+                    yield f"{root_key}.{item}", sublime.Region(item.offset, item.end), None, None
+
+    @staticmethod
+    def has_symbols(value) -> bool:
+        if isinstance(value, OrderedDict):
+            return len(value) > 0
+        return isinstance(value, list) and any(isinstance(item, str) for item in value)
 
     def goto(self, pos):
-        string_to_search = self.goto_items[pos]
+        if pos < 0:
+            return
+        if pos == len(self.goto_items):
+            sublime.set_timeout_async(self.next_page)
+            return
+        if pos in self.deeper:
+            item, goto_item, (value, name) = self.deeper[pos]
+            sublime.set_timeout_async(
+                functools.partial(self.list_symbols, value, name, (item, goto_item))
+            )
+            return
 
-        found = 0
-        for index, item in enumerate(self.goto_items):
-            if index >= pos:
-                break
-            if item == string_to_search:
-                found += 1
-
-        regions = self.view.find_all(string_to_search, sublime.LITERAL)
-        for i, r in enumerate(regions):
-            line = self.view.substr(self.view.full_line(r))
-            if ":" in line:
-                split = line.split(":")
-                val = split[1].strip()
-                if string_to_search in val:
-                    del regions[i]
-
-        region = regions[found]
+        region = self.goto_items[pos]
         self.view.sel().clear()
         self.view.sel().add(region)
         self.view.show(region)
@@ -1,33 +1,124 @@
+import functools
+import threading
+
 import sublime
 import sublime_plugin
 
-from .PrettyJson import PrettyJsonBaseCommand
-
-s = sublime.load_settings("Pretty JSON.sublime-settings")
+from .PrettyJson import PARSE_CACHE, PrettyJsonBaseCommand, get_settings
+from .lib.validator import IncrementalValidator
 
 
 class PrettyJsonLintListener(sublime_plugin.ViewEventListener, PrettyJsonBaseCommand):
-    def on_post_save(self):
-        if not s.get("validate_on_save", True):
+    validator = None
+    content_change_count = None
+    content_cache = True
+
+    def __init__(self, view):
+        super().__init__(view)
+        # on save and while typing validate on different threads
+        self.lock = threading.Lock()
+
+    def on_post_save_async(self):
+        if not get_settings().validate_on_save:
             return
 
-        as_json = s.get("as_json", ["JSON"])
-        view_syntax = self.view.settings().get("syntax")
-        if any(syntax in view_syntax for syntax in as_json):
+        if self.is_json():
             self.clear_phantoms()
             json_content = self.view.substr(sublime.Region(0, self.view.size()))
             try:
-                self.json_loads(json_content)
+                self.validate(json_content, self.view.change_count())
             except Exception as ex:
                 self.show_exception(msg=ex)
+                self.show_errors(self.collect_errors(json_content, ex), scroll=True)
+
+    def on_modified_async(self):
+        settings = get_settings()
+        if not settings.validate_while_typing or not self.is_json():
+            return
+        if self.view.size() > settings.validate_while_typing_max_size:
+            return
+
+        # every keystroke restarts the wait, only the last one lints
+        sublime.set_timeout_async(
+            functools.partial(self.lint_typed, self.view.change_count()),
+            settings.validate_while_typing_delay,
+        )
+
+    def lint_typed(self, change_count: int):
+        if not self.view.is_valid() or self.view.change_count() != change_count:
+            return
+
+        json_content = self.view.substr(sublime.Region(0, self.view.size()))
+        errors = list()
+        try:
+            # the next keystroke discards the parsed document, so keeping it
+            # would only push out the documents of other views
+            self.validate(json_content, change_count, cache=False)
+        except Exception as ex:
+            if self.view.change_count() != change_count:
+                return
+            errors = self.collect_errors(json_content, ex)
+        if self.view.change_count() == change_count:
+            sublime.set_timeout(functools.partial(self.show_typed, change_count, errors))
+
+    def show_typed(self, change_count: int, errors: list):
+        # the text may have changed while the result waited for the main thread
+        if self.view.change_count() != change_count:
+            return
+        self.clear_phantoms()
+        self.show_errors(errors, scroll=False)
+
+    def show_errors(self, errors: list, scroll: bool):
+        for error in errors:
+            self.highlight_error(
+                sublime.Region(0, self.view.size()), f"{error}", scroll, getattr(error, "pos", None)
+            )
+
+    def validate(self, json_content: str, change_count: int, cache: bool = True):
+        with self.lock:
+            if self.validator is None:
+                # only what changed since the last valid text is parsed again
+                self.validator = IncrementalValidator(
+                    self.parse_content,
+                    functools.partial(self.json_raw_decode, object_pairs_hook=self.duplicate_key_hook),
+                )
+            self.content_change_count = change_count
+            self.content_cache = cache
+            self.validator.validate(json_content)
+
+    def parse_content(self, json_content):
+        region = sublime.Region(0, len(json_content))
+        return self.parse_region(
+            region, json_content, self.content_change_count, check_duplicates=True, cache=self.content_cache
+        )
+
+    def is_json(self) -> bool:
+        as_json = get_settings().as_json
+        view_syntax = self.view.settings().get("syntax")
+        return any(syntax in view_syntax for syntax in as_json)
 
 
 class PrettyJsonAutoPrettyOnSaveListener(sublime_plugin.EventListener):
     def on_pre_save(self, view):
-        if not s.get("pretty_on_save", False):
+        settings = get_settings()
+        if not settings.pretty_on_save:
             return
 
-        as_json = s.get("as_json", ["JSON"])
+        as_json = settings.as_json
         view_syntax = view.settings().get("syntax")
         if any(syntax in view_syntax for syntax in as_json):
-            view.run_command("pretty_json")
+            # Formatting has to be done before the file is written
+            view.run_command("pretty_json", {"background": False})
+
+
+class PrettyJsonParseCacheListener(sublime_plugin.EventListener):
+    """Drops the documents parsed from a view once it changes or closes"""
+
+    def on_modified_async(self, view):
+        self.discard(view.id())
+
+    def on_close(self, view):
+        self.discard(view.id())
+
+    def discard(self, view_id):
+        PARSE_CACHE.discard(lambda key: key[0] == view_id)
@@ -0,0 +1,370 @@
+"""
+Evaluates the common subset of jq filters on decoded JSON documents:
+
+    .  .a.b  ."key"  .[n]  .["key"]  .[]  |  ,  [f]  (f)
+    select(f)  map(f)  keys  length  not  empty
+    ==  !=  <  <=  >  >=  and  or
+    string, number, true, false and null literals
+
+A filter is compiled once into a plan of nested closures. Each closure
+takes the input value and returns an iterator over the results, like a jq
+filter produces a stream. Anything outside the subset raises
+UnsupportedQuery, so the caller can hand the filter to the jq binary.
+"""
+import itertools
+import json
+import re
+from numbers import Number
+
+try:
+    from .simplejson import RawJSON
+except ImportError:
+    from simplejson import RawJSON
+
+__all__ = ["compile", "JqError", "UnsupportedQuery"]
+
+
+class JqError(Exception):
+    """Raised while running a filter, like jq's runtime errors"""
+
+
+class UnsupportedQuery(ValueError):
+    """Raised when a filter is invalid or outside the supported subset"""
+
+
+TOKEN = re.compile(
+    r"""[ \t\r\n]*(?:
+        (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+      | (?P<string>"(?:[^"\\]|\\[^(])*")
+      | (?P<field>\.[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op>==|!=|<=|>=|<|>|\||,|\(|\)|\[|\]|\.(?!\.))
+      | (?P<end>$)
+    )""",
+    re.VERBOSE,
+)
+
+CONSTANTS = {"true": True, "false": False, "null": None}
+
+
+def tokenize(query: str):
+    tokens = list()
+    pos = 0
+    while True:
+        m = TOKEN.match(query, pos)
+        if m is None:
+            raise UnsupportedQuery(f"unsupported filter at character {pos}: {query[pos:pos + 10]!r}")
+        kind = m.lastgroup
+        tokens.append((kind, m.group(kind)))
+        if kind == "end":
+            return tokens
+        pos = m.end()
+
+
+def type_name(value) -> str:
+    if value is None:
+        return "null"
+    if value is True or value is False:
+        return "boolean"
+    if isinstance(value, (Number, RawJSON)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    return "object"
+
+
+def truthy(value) -> bool:
+    return value is not None and value is not False
+
+
+def sort_key(value):
+    """Orders values the way jq does: null, false, true, numbers, strings,
+    arrays and objects"""
+    if value is None:
+        return (0,)
+    if value is False:
+        return (1,)
+    if value is True:
+        return (2,)
+    if isinstance(value, RawJSON):
+        return (3, float(value.encoded_json))
+    if isinstance(value, Number):
+        return (3, value)
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, list):
+        return (5, [sort_key(item) for item in value])
+    keys = sorted(value)
+    return (6, keys, [sort_key(value[key]) for key in keys])
+
+
+COMPARISONS = {
+    "==": lambda a, b: sort_key(a) == sort_key(b),
+    "!=": lambda a, b: sort_key(a) != sort_key(b),
+    "<": lambda a, b: sort_key(a) < sort_key(b),
+    "<=": lambda a, b: sort_key(a) <= sort_key(b),
+    ">": lambda a, b: sort_key(a) > sort_key(b),
+    ">=": lambda a, b: sort_key(a) >= sort_key(b),
+}
+
+
+def index(value, key):
+    if value is None:
+        return None
+    if isinstance(key, str):
+        if isinstance(value, dict):
+            return value.get(key)
+        raise JqError(f'Cannot index {type_name(value)} with "{key}"')
+    if isinstance(key, RawJSON):
+        key = float(key.encoded_json)
+    if isinstance(key, Number) and not isinstance(key, bool) and isinstance(value, list):
+        position = int(key)
+        if position < 0:
+            position += len(value)
+        if 0 <= position < len(value):
+            return value[position]
+        return None
+    raise JqError(f"Cannot index {type_name(value)} with {type_name(key)}")
+
+
+def iterate(value):
+    if isinstance(value, list):
+        return iter(value)
+    if isinstance(value, dict):
+        return iter(value.values())
+    raise JqError(f"Cannot iterate over {type_name(value)}")
+
+
+def keys(value):
+    if isinstance(value, dict):
+        return sorted(value)
+    if isinstance(value, list):
+        return list(range(len(value)))
+    raise JqError(f"{type_name(value)} has no keys")
+
+
+def length(value):
+    if value is None:
+        return 0
+    if value is True or value is False:
+        raise JqError("boolean has no length")
+    if isinstance(value, RawJSON):
+        return abs(float(value.encoded_json))
+    if isinstance(value, Number):
+        return abs(value)
+    return len(value)
+
+
+class Parser:
+    """Recursive descent parser returning the compiled plan"""
+
+    def __init__(self, query: str):
+        self.tokens = tokenize(query)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def accept(self, value: str) -> bool:
+        kind, text = self.peek()
+        if kind in ("op", "ident") and text == value:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, value: str):
+        if not self.accept(value):
+            raise UnsupportedQuery(f"expected {value!r}, found {self.peek()[1]!r}")
+
+    def parse(self):
+        plan = self.pipe()
+        if self.peek()[0] != "end":
+            raise UnsupportedQuery(f"unsupported filter near {self.peek()[1]!r}")
+        return plan
+
+    def pipe(self):
+        left = self.comma()
+        while self.accept("|"):
+            left = pipe(left, self.comma())
+        return left
+
+    def comma(self):
+        left = self.alternative()
+        while self.accept(","):
+            left = comma(left, self.alternative())
+        return left
+
+    def alternative(self):
+        left = self.conjunction()
+        while self.accept("or"):
+            left = disjunction(left, self.conjunction())
+        return left
+
+    def conjunction(self):
+        left = self.comparison()
+        while self.accept("and"):
+            left = conjunction(left, self.comparison())
+        return left
+
+    def comparison(self):
+        left = self.postfix()
+        kind, text = self.peek()
+        if kind == "op" and text in COMPARISONS:
+            self.pos += 1
+            return compare(COMPARISONS[text], left, self.postfix())
+        return left
+
+    def postfix(self):
+        plan = self.primary()
+        while True:
+            kind, text = self.peek()
+            if kind == "field":
+                self.pos += 1
+                plan = pipe(plan, field(text[1:]))
+            elif kind == "op" and text == "." and self.tokens[self.pos + 1][0] == "string":
+                self.pos += 1
+                plan = pipe(plan, field(json.loads(self.next()[1])))
+            elif kind == "op" and text == "[":
+                plan = pipe(plan, self.brackets())
+            elif kind == "op" and text == "." and self.tokens[self.pos + 1] == ("op", "["):
+                self.pos += 1
+                plan = pipe(plan, self.brackets())
+            else:
+                return plan
+
+    def brackets(self):
+        self.expect("[")
+        if self.accept("]"):
+            return iterate
+        key = self.pipe()
+        self.expect("]")
+        return lookup(key)
+
+    def primary(self):
+        kind, text = self.next()
+        if kind == "field":
+            return field(text[1:])
+        if kind == "number":
+            return constant(json.loads(text))
+        if kind == "string":
+            return constant(json.loads(text))
+        if kind == "op":
+            if text == ".":
+                if self.peek()[0] == "string":
+                    return field(json.loads(self.next()[1]))
+                return identity
+            if text == "(":
+                plan = self.pipe()
+                self.expect(")")
+                return plan
+            if text == "[":
+                if self.accept("]"):
+                    return lambda value: iter(([],))
+                plan = self.pipe()
+                self.expect("]")
+                return collect(plan)
+        if kind == "ident":
+            if text in CONSTANTS:
+                return constant(CONSTANTS[text])
+            if text in FUNCTIONS:
+                return FUNCTIONS[text]
+            if text in FILTER_FUNCTIONS:
+                self.expect("(")
+                plan = self.pipe()
+                self.expect(")")
+                return FILTER_FUNCTIONS[text](plan)
+        raise UnsupportedQuery(f"unsupported filter near {text!r}")
+
+
+def identity(value):
+    return iter((value,))
+
+
+def constant(result):
+    return lambda value: iter((result,))
+
+
+def field(name: str):
+    return lambda value: iter((index(value, name),))
+
+
+def lookup(key_plan):
+    return lambda value: (index(value, key) for key in key_plan(value))
+
+
+def collect(plan):
+    return lambda value: iter((list(plan(value)),))
+
+
+def pipe(left, right):
+    return lambda value: (result for item in left(value) for result in right(item))
+
+
+def comma(left, right):
+    return lambda value: itertools.chain(left(value), right(value))
+
+
+def compare(operator, left, right):
+    # Like jq, the right hand side is the outer loop
+    return lambda value: (
+        operator(a, b) for b in right(value) for a in left(value)
+    )
+
+
+def disjunction(left, right):
+    def run(value):
+        for a in left(value):
+            if truthy(a):
+                yield True
+            else:
+                for b in right(value):
+                    yield truthy(b)
+    return run
+
+
+def conjunction(left, right):
+    def run(value):
+        for a in left(value):
+            if not truthy(a):
+                yield False
+            else:
+                for b in right(value):
+                    yield truthy(b)
+    return run
+
+
+def select(plan):
+    return lambda value: (value for result in plan(value) if truthy(result))
+
+
+def map_(plan):
+    return lambda value: iter(([result for item in iterate(value) for result in plan(item)],))
+
+
+FUNCTIONS = {
+    "keys": lambda value: iter((keys(value),)),
+    "length": lambda value: iter((length(value),)),
+    "not": lambda value: iter((not truthy(value),)),
+    "empty": lambda value: iter(()),
+}
+
+FILTER_FUNCTIONS = {
+    "select": select,
+    "map": map_,
+}
+
+
+def compile(query: str):
+    """
+    Compile a jq filter into a function taking the input value and
+    returning an iterator over the results. Raises UnsupportedQuery if the
+    filter is not in the supported subset.
+    """
+    return Parser(query).parse()
@@ -0,0 +1,173 @@
+"""
+Converts JSON text to the XML json2xml has always written, i.e. the
+ElementTree of the decoded document serialized with et.tostring:
+
+    {"a": {"b": 1}, "c": [true]}
+
+    <root><a><b value="1" /></a><c><items><item value="True" /></items></c></root>
+
+The text is converted token by token while it is scanned, without
+decoding the document or building the tree, so memory grows with the
+nesting depth rather than the document size. Values are written as str()
+of the decoded value. Unlike decoding, repeated keys of an object are all
+written.
+"""
+# Attribute values are escaped by ElementTree itself, whose escaping of
+# line breaks changed between Python versions
+from xml.etree.ElementTree import _escape_attrib as escape_attrib
+
+try:
+    from .simplejson import loads
+    from .simplejson.decoder import scanstring
+    from .simplejson.errors import JSONDecodeError
+    from .simplejson.reformatter import TOKEN
+except ImportError:
+    from simplejson import loads
+    from simplejson.decoder import scanstring
+    from simplejson.errors import JSONDecodeError
+    from simplejson.reformatter import TOKEN
+
+__all__ = ["iterxml", "XML_DECLARATION", "UnsupportedDocument"]
+
+XML_DECLARATION = "<?xml version='1.0' encoding='UTF-8' ?>\n"
+
+# Kinds of tokens matched by TOKEN
+PLAIN_STRING, NUMBER, CONSTANT, OPEN, CLOSE, COMMA, COLON, STRING, END = range(1, 10)
+
+# Parser states
+VALUE, ITEM_OR_CLOSE, KEY, KEY_OR_CLOSE, COLON_NEXT, NEXT, DONE = range(7)
+
+CONSTANTS = {
+    "true": "True",
+    "false": "False",
+    "null": "None",
+    "NaN": "nan",
+    "Infinity": "inf",
+    "-Infinity": "-inf",
+}
+
+
+class UnsupportedDocument(ValueError):
+    """
+    Raised for keys starting with {, which ElementTree writes with a
+    namespace prefix declared on the root element when they look like
+    {uri}name and rejects otherwise
+    """
+
+
+def raise_error(text: str, pos: int):
+    # The decoder reports the error, as it did when the document was decoded
+    loads(text)
+    raise JSONDecodeError("Expecting value", text, pos)
+
+
+def iterxml(text: str, chunk_size: int = 8192):
+    """
+    Yield the XML of the JSON document text, starting with XML_DECLARATION,
+    in chunks of roughly chunk_size elements. Invalid documents raise the
+    same JSONDecodeError as decoding them, possibly after some chunks.
+    """
+    match = TOKEN.match
+    chunks = [XML_DECLARATION]
+    emit = chunks.append
+    # (is_object, tag) of every open container
+    stack = list()
+    tag = "root"
+    state = VALUE
+    pos = 1 if text[:1] == "\ufeff" else 0
+    while True:
+        if len(chunks) >= chunk_size:
+            yield "".join(chunks)
+            del chunks[:]
+        m = match(text, pos)
+        if m is None:
+            raise_error(text, pos)
+        kind = m.lastindex
+        pos = m.end()
+
+        if state == NEXT:
+            frame = stack[-1]
+            if kind == COMMA:
+                if frame[0]:
+                    state = KEY
+                else:
+                    tag = "item"
+                    state = VALUE
+                continue
+            if kind == CLOSE and (m.group(CLOSE) == "}") == frame[0]:
+                stack.pop()
+                emit("</" + frame[1] + ">" if frame[0] else "</items></" + frame[1] + ">")
+                state = NEXT if stack else DONE
+                continue
+            raise_error(text, m.start(kind))
+
+        if state == KEY or state == KEY_OR_CLOSE:
+            if kind == PLAIN_STRING:
+                tag = m.group(PLAIN_STRING)[1:-1]
+            elif kind == STRING:
+                tag, pos = scanstring(text, pos)
+            elif kind == CLOSE and state == KEY_OR_CLOSE and m.group(CLOSE) == "}":
+                # Empty objects are values
+                frame = stack.pop()
+                emit('<' + frame[1] + ' value="{}" />')
+                state = NEXT if stack else DONE
+                continue
+            else:
+                raise_error(text, m.start(kind))
+            if tag[:1] == "{":
+                raise UnsupportedDocument(f"key {tag!r} starts with {{")
+            if state == KEY_OR_CLOSE:
+                emit("<" + stack[-1][1] + ">")
+            state = COLON_NEXT
+            continue
+
+        if state == COLON_NEXT:
+            if kind != COLON:
+                raise_error(text, m.start(kind))
+            state = VALUE
+            continue
+
+        if state == DONE:
+            if kind != END:
+                raise_error(text, m.start(kind))
+            break
+
+        # A value is expected: VALUE or ITEM_OR_CLOSE
+        if kind == CLOSE and state == ITEM_OR_CLOSE and m.group(CLOSE) == "]":
+            # Empty array
+            frame = stack.pop()
+            emit("<" + frame[1] + "><items /></" + frame[1] + ">")
+            state = NEXT if stack else DONE
+            continue
+        if kind not in (PLAIN_STRING, NUMBER, CONSTANT, STRING, OPEN):
+            raise_error(text, m.start(kind))
+        if state == ITEM_OR_CLOSE:
+            emit("<" + stack[-1][1] + "><items>")
+
+        if kind == OPEN:
+            is_object = m.group(OPEN) == "{"
+            stack.append((is_object, tag))
+            if is_object:
+                state = KEY_OR_CLOSE
+            else:
+                tag = "item"
+                state = ITEM_OR_CLOSE
+            continue
+
+        if kind == PLAIN_STRING:
+            value = m.group(PLAIN_STRING)[1:-1]
+        elif kind == STRING:
+            value, pos = scanstring(text, pos)
+        elif kind == NUMBER:
+            number = m.group(NUMBER)
+            if "." in number or "e" in number or "E" in number:
+                value = str(float(number))
+            else:
+                value = str(int(number))
+        else:
+            value = CONSTANTS[m.group(CONSTANT)]
+        emit("<" + tag + ' value="' + escape_attrib(value) + '" />')
+        state = NEXT if stack else DONE
+
+    if chunks:
+        yield "".join(chunks)
@@ -0,0 +1,35 @@
+"""
+Turns the selections of a view into the spans a command works on.
+
+An empty selection stands for the whole document when it is the only one
+and use_entire_file is set, so that a command run without selecting
+anything formats the file. Next to other selections an empty one is just a
+cursor and is skipped. Each span is replaced separately, so spans repeating
+or overlapping an earlier one are dropped; replacing both would write the
+second one at stale offsets.
+"""
+
+__all__ = ["select_spans"]
+
+
+def select_spans(spans, size: int, use_entire_file: bool = True) -> list:
+    """
+    Return (begin, end, entire_file) for every (begin, end) selected in a
+    document of size characters, ordered by begin
+    """
+    spans = list(spans)
+    selected = list()
+    last_end = None
+    for begin, end in sorted(spans):
+        entire_file = False
+        if begin == end:
+            if len(spans) > 1:
+                continue
+            if use_entire_file:
+                begin, end = 0, size
+                entire_file = True
+        if last_end is not None and begin < last_end:
+            continue
+        selected.append((begin, end, entire_file))
+        last_end = end
+    return selected
@@ -122,16 +122,23 @@ __version__ = '3.17.0'
 __all__ = [
     'dump', 'dumps', 'load', 'loads',
     'JSONDecoder', 'JSONDecodeError', 'JSONEncoder',
-    'OrderedDict', 'simple_first', 'RawJSON'
+    'OrderedDict', 'simple_first', 'RawJSON', 'FastJSONDecoder',
+    'reformat', 'iterreformat', 'scan_errors', 'LocatedKey',
+    'get_encoder', 'get_decoder', 'scan_bytes_errors',
 ]
 
 __author__ = 'Bob Ippolito <bob@redivi.com>'
 
+import threading
 from decimal import Decimal
 
 from .errors import JSONDecodeError
 from .raw_json import RawJSON
-from .decoder import JSONDecoder
+from .decoder import JSONDecoder, LocatedKey
+from .fast_decoder import FastJSONDecoder
+from .reformatter import reformat, iterreformat
+from .tolerant_scanner import scan_errors
+from .bytes_scanner import scan_bytes_errors
 from .encoder import JSONEncoder, JSONEncoderForHTML
 def _import_OrderedDict():
     import collections
@@ -542,6 +549,62 @@ def loads(s, encoding=None, cls=None, object_hook=None, parse_float=None,
     return cls(encoding=encoding, **kw).decode(s)
 
 
+# Encoders and decoders returned by get_encoder and get_decoder, by class
+# and options, least recently used first
+_cached_encoders = OrderedDict()
+_cached_decoders = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 32
+
+
+def _get_cached(cache, cls, kw):
+    try:
+        key = (cls,) + tuple(sorted(kw.items()))
+        hash(key)
+    except TypeError:
+        # an option that cannot be hashed, such as a list
+        return cls(**kw)
+    with _cache_lock:
+        instance = cache.pop(key, None)
+        if instance is None:
+            instance = cls(**kw)
+            if len(cache) >= _CACHE_SIZE:
+                cache.popitem(last=False)
+        cache[key] = instance
+    return instance
+
+
+def get_encoder(cls=None, **kw):
+    """Return an encoder created with ``cls(**kw)``, sharing it with earlier
+    calls that passed the same class and options.
+
+    ``get_encoder(**kw).encode(obj)`` is the same as ``dumps(obj, **kw)``
+    without creating an encoder for every call, which matters when many
+    small documents are encoded with the same options, e.g. JSON lines.
+    *cls* defaults to :class:`JSONEncoder`.  The encoder must not be
+    changed once returned.
+
+    """
+    if cls is None:
+        cls = JSONEncoder
+    return _get_cached(_cached_encoders, cls, kw)
+
+
+def get_decoder(cls=None, **kw):
+    """Return a decoder created with ``cls(**kw)``, sharing it with earlier
+    calls that passed the same class and options.
+
+    ``get_decoder(**kw).decode(s)`` is the same as ``loads(s, **kw)``
+    without creating a decoder and its scanner for every call.  *cls*
+    defaults to :class:`JSONDecoder`.  The decoder must not be changed once
+    returned.
+
+    """
+    if cls is None:
+        cls = JSONDecoder
+    return _get_cached(_cached_decoders, cls, kw)
+
+
 def _toggle_speedups(enabled):
     from . import decoder as dec
     from . import encoder as enc
@@ -559,6 +622,8 @@ def _toggle_speedups(enabled):
         enc.encode_basestring_ascii = enc.py_encode_basestring_ascii
         scan.make_scanner = scan.py_make_scanner
     dec.make_scanner = scan.make_scanner
+    _cached_encoders.clear()
+    _cached_decoders.clear()
     global _default_decoder
     _default_decoder = JSONDecoder(
         encoding=None,
@@ -0,0 +1,180 @@
+"""Find the syntax errors of a JSON document given as UTF-8 bytes, such as
+a memory mapped file, without decoding it
+"""
+from __future__ import absolute_import
+import re
+from .errors import JSONDecodeError
+from .tolerant_scanner import Grammar, scan
+
+__all__ = ['scan_bytes_errors', 'BytesDecodeError']
+
+# The inside of a string up to the first byte that may not be in it, which
+# is its closing quote if it is valid: ASCII characters, escapes and
+# well-formed UTF-8 sequences
+STRING_BODY = re.compile(
+    br'[ !#-\[\]-\x7f]*(?:(?:'
+    br'\\["\\/bfnrt]|\\u[0-9a-fA-F]{4}'
+    br'|[\xc2-\xdf][\x80-\xbf]'
+    br'|\xe0[\xa0-\xbf][\x80-\xbf]|[\xe1-\xec\xee\xef][\x80-\xbf]{2}'
+    br'|\xed[\x80-\x9f][\x80-\xbf]'
+    br'|\xf0[\x90-\xbf][\x80-\xbf]{2}|[\xf1-\xf3][\x80-\xbf]{3}'
+    br'|\xf4[\x80-\x8f][\x80-\xbf]{2}'
+    br')[ !#-\[\]-\x7f]*)*')
+# Blank lines of JSON Lines
+BLANK = re.compile(br'[ \t\r]*')
+BOM = b'\xef\xbb\xbf'
+# UTF-8 continuation bytes, which do not start a character
+CONTINUATION = bytes(bytearray(range(0x80, 0xc0)))
+# Bytes looked at in one piece when counting lines and columns
+BLOCK_SIZE = 1 << 24
+
+class BytesDecodeError(JSONDecodeError):
+    """A :class:`JSONDecodeError` found in bytes, which are not kept.
+
+    ``pos`` is a byte offset, ``lineno`` and ``colno`` count characters as
+    for decoded text. ``char`` is the character at ``pos``, which ``msg``
+    may show in place of ``%r``.
+
+    """
+    def __init__(self, msg, pos, lineno, colno, char=u''):
+        ValueError.__init__(self, '%s: line %d column %d (byte %d)' % (
+            msg.replace('%r', repr(char)), lineno, colno, pos))
+        self.msg = msg
+        self.doc = None
+        self.pos = pos
+        self.end = None
+        self.lineno = lineno
+        self.colno = colno
+        self.endlineno = self.endcolno = None
+        self.char = char
+
+    def __reduce__(self):
+        return self.__class__, (self.msg, self.pos, self.lineno, self.colno,
+                                self.char)
+
+
+def scan_bytes_errors(b, max_errors=100, lines=False, progress=None,
+                      progress_step=BLOCK_SIZE):
+    """Return a list with a :class:`BytesDecodeError` for every syntax error
+    of the UTF-8 encoded JSON document ``b``, in document order, or an empty
+    list if it is valid.
+
+    ``b`` may be anything regular expressions search, such as an
+    :class:`mmap.mmap`, and is never copied as a whole, so memory use does
+    not grow with its size. Errors are found and recovered from as by
+    :func:`scan_errors`, which also reports invalid UTF-8 in strings but
+    not repeated keys. If *lines* is true, every line is a document of its
+    own, as in JSON Lines, and blank lines are skipped.
+
+    *progress* is called with the offset reached about every
+    *progress_step* bytes; whatever it raises stops the scan.
+
+    """
+    found = []
+    size = len(b)
+    pos = len(BOM) if b[:len(BOM)] == BOM else 0
+    if not lines:
+        scan(BYTES_GRAMMAR, b, pos, size, found, max_errors,
+             progress=progress, progress_step=progress_step)
+    else:
+        find = b.find
+        blank = BLANK.match
+        next_progress = progress_step
+        while pos <= size and len(found) < max_errors:
+            end = find(b'\n', pos)
+            if end < 0:
+                end = size
+            if blank(b, pos, end).end() != end:
+                scan(BYTES_GRAMMAR, b, pos, end, found, max_errors)
+            if progress is not None and end >= next_progress:
+                progress(end)
+                next_progress = end + progress_step
+            pos = end + 1
+    return _locate(b, found)
+
+
+def _read_string(b, start, endpos, progress, progress_step):
+    # The end of the string starting at start, its error, if any, and no
+    # decoded string since nothing is decoded. Long strings are matched a
+    # window at a time so that progress is reported within them; a window
+    # always holds the longest escape or UTF-8 sequence.
+    end = start + 1
+    while True:
+        limit = min(endpos, end + max(progress_step, 8)) if progress else endpos
+        stop = STRING_BODY.match(b, end, limit).end()
+        if limit == endpos or stop == end:
+            end = stop
+            break
+        end = stop
+        progress(end)
+    if end < endpos and b[end:end + 1] == b'"':
+        return end + 1, None, None
+    error = _string_error(b, start, end, endpos)
+    lenient = BYTES_GRAMMAR.lenient_string.match(b, start + 1, endpos)
+    if error[0].startswith('Unterminated') or lenient is None:
+        return None, error, None
+    return lenient.end(), error, None
+
+
+# The tolerant scanner's patterns for bytes. Plain strings are short and
+# ASCII only; other strings are checked to be UTF-8 by _read_string, which
+# reports progress within long ones.
+BYTES_GRAMMAR = Grammar(
+    r'"[ !#-\[\]-\x7f]{0,65536}"', lambda pattern: pattern.encode('ascii'),
+    _read_string)
+
+
+def _string_error(b, start, end, endpos):
+    # The error of the string starting at start whose valid part ends at
+    # end, at the offset the decoder reports it
+    if end >= endpos:
+        return ('Unterminated string starting at', start)
+    c = b[end:end + 1]
+    if c == b'\\':
+        escape = b[end + 1:end + 2] if end + 1 < endpos else b''
+        if not escape:
+            return ('Unterminated string starting at', start)
+        if escape == b'u':
+            return ('Invalid \\uXXXX escape sequence', end)
+        return ('Invalid \\X escape sequence %r', end + 1)
+    if c < b' ':
+        return ('Invalid control character %r at', end + 1)
+    return ('Invalid UTF-8 byte at', end)
+
+
+def _locate(b, found):
+    # Turn (message, offset) into errors, counting lines and columns in one
+    # pass over the bytes before the last error: each error carries the
+    # line and column on from the previous one
+    errors = []
+    lineno = 1
+    colno = 1
+    counted = 0
+    for error in found:
+        msg, pos = error[:2]
+        newline = b.rfind(b'\n', counted, pos)
+        if newline >= 0:
+            lineno += _count_lines(b, counted, newline + 1)
+            colno = 1
+            counted = newline + 1
+        colno += _count_characters(b, counted, pos)
+        counted = max(counted, pos)
+        # the character shown for %r, as the decoder does
+        char = b[pos:pos + 4].decode('utf-8', 'replace')[:1]
+        errors.append(BytesDecodeError(msg, pos, lineno, colno, char))
+    return errors
+
+
+def _count_lines(b, begin, end):
+    count = 0
+    for block in range(begin, end, BLOCK_SIZE):
+        count += b[block:min(block + BLOCK_SIZE, end)].count(b'\n')
+    return count
+
+
+def _count_characters(b, begin, end):
+    count = 0
+    for block in range(begin, end, BLOCK_SIZE):
+        count += len(
+            b[block:min(block + BLOCK_SIZE, end)].translate(None, CONTINUATION))
+    return count
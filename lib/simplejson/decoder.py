@@ -1,11 +1,13 @@
 """Implementation of JSONDecoder
 """
 from __future__ import absolute_import
+import functools
 import re
 import sys
 import struct
-from .compat import PY3, unichr
-from .scanner import make_scanner, JSONDecodeError
+from .compat import PY3, text_type, unichr
+from .scanner import make_scanner, py_make_scanner, JSONDecodeError
+from .raw_json import RawJSON
 
 def _import_c_scanstring():
     try:
@@ -17,7 +19,7 @@ c_scanstring = _import_c_scanstring()
 
 # NOTE (3.1.0): JSONDecodeError may still be imported from this module for
 # compatibility, but it was never in the __all__
-__all__ = ['JSONDecoder']
+__all__ = ['JSONDecoder', 'LocatedKey']
 
 FLAGS = re.VERBOSE | re.MULTILINE | re.DOTALL
 
@@ -139,8 +141,23 @@ scanstring = c_scanstring or py_scanstring
 WHITESPACE = re.compile(r'[ \t\n\r]*', FLAGS)
 WHITESPACE_STR = ' \t\n\r'
 
+
+class LocatedKey(text_type):
+    """An object key or a string item of an array decoded with
+    ``locate_keys``, which remembers where it was written: ``offset`` is
+    the index of its opening quote in the document and ``end`` the index
+    after its closing quote
+
+    """
+    def __new__(cls, key, offset, end):
+        self = text_type.__new__(cls, key)
+        self.offset = offset
+        self.end = end
+        return self
+
+
 def JSONObject(state, encoding, strict, scan_once, object_hook,
-        object_pairs_hook, memo=None,
+        object_pairs_hook, memo=None, located=False,
         _w=WHITESPACE.match, _ws=WHITESPACE_STR):
     (s, end) = state
     # Backwards compatibility
@@ -171,8 +188,14 @@ def JSONObject(state, encoding, strict, scan_once, object_hook,
                 s, end)
     end += 1
     while True:
-        key, end = scanstring(s, end, encoding, strict)
-        key = memo_get(key, key)
+        if located:
+            # Every key keeps its own offset, so keys are not shared
+            offset = end - 1
+            key, end = scanstring(s, end, encoding, strict)
+            key = LocatedKey(key, offset, end)
+        else:
+            key, end = scanstring(s, end, encoding, strict)
+            key = memo_get(key, key)
 
         # To skip some function call overhead we optimize the fast paths where
         # the JSON key separator is ": " or just ":".
@@ -233,7 +256,8 @@ def JSONObject(state, encoding, strict, scan_once, object_hook,
         pairs = object_hook(pairs)
     return pairs, end
 
-def JSONArray(state, scan_once, _w=WHITESPACE.match, _ws=WHITESPACE_STR):
+def JSONArray(state, scan_once, located=False,
+        _w=WHITESPACE.match, _ws=WHITESPACE_STR):
     (s, end) = state
     values = []
     nextchar = s[end:end + 1]
@@ -247,7 +271,12 @@ def JSONArray(state, scan_once, _w=WHITESPACE.match, _ws=WHITESPACE_STR):
         raise JSONDecodeError("Expecting value or ']'", s, end)
     _append = values.append
     while True:
-        value, end = scan_once(s, end)
+        if located and s[end:end + 1] == '"':
+            offset = end
+            value, end = scan_once(s, end)
+            value = LocatedKey(value, offset, end)
+        else:
+            value, end = scan_once(s, end)
         _append(value)
         nextchar = s[end:end + 1]
         if nextchar in _ws:
@@ -301,7 +330,7 @@ class JSONDecoder(object):
 
     def __init__(self, encoding=None, object_hook=None, parse_float=None,
             parse_int=None, parse_constant=None, strict=True,
-            object_pairs_hook=None):
+            object_pairs_hook=None, raw_numbers=False, locate_keys=False):
         """
         *encoding* determines the encoding used to interpret any
         :class:`str` objects decoded by this instance (``'utf-8'`` by
@@ -344,21 +373,41 @@ class JSONDecoder(object):
         ``True`` means that unescaped control characters are parse errors, if
         ``False`` then control characters will be allowed in strings.
 
+        If *raw_numbers* is true (default: ``False``), numbers are not
+        converted at all: each one is decoded as a :class:`RawJSON` holding
+        its original text, which the encoder writes back verbatim. This is
+        lossless and cheaper than ``parse_float=decimal.Decimal``. It
+        overrides *parse_float* and *parse_int*.
+
+        If *locate_keys* is true (default: ``False``), object keys and
+        string items of arrays are decoded as :class:`LocatedKey` strings
+        holding the offsets where they were written in the document, e.g.
+        to select a key in an editor without searching for it.
+
         """
         if encoding is None:
             encoding = DEFAULT_ENCODING
         self.encoding = encoding
         self.object_hook = object_hook
         self.object_pairs_hook = object_pairs_hook
+        if raw_numbers:
+            parse_float = parse_int = RawJSON
         self.parse_float = parse_float or float
         self.parse_int = parse_int or int
         self.parse_constant = parse_constant or _CONSTANTS.__getitem__
         self.strict = strict
+        self.locate_keys = locate_keys
         self.parse_object = JSONObject
         self.parse_array = JSONArray
         self.parse_string = scanstring
         self.memo = {}
-        self.scan_once = make_scanner(self)
+        if locate_keys:
+            # The C scanner has its own object parser
+            self.parse_object = functools.partial(JSONObject, located=True)
+            self.parse_array = functools.partial(JSONArray, located=True)
+            self.scan_once = py_make_scanner(self)
+        else:
+            self.scan_once = make_scanner(self)
 
     def decode(self, s, _w=WHITESPACE.match, _PY3=PY3):
         """Return the Python representation of ``s`` (a ``str`` or ``unicode``
@@ -144,7 +144,9 @@ class JSONEncoder(object):
                  use_decimal=True, namedtuple_as_object=True,
                  tuple_as_array=True, bigint_as_string=False,
                  item_sort_key=None, for_json=False, ignore_nan=False,
-                 int_as_string_bitcount=None, iterable_as_array=False):
+                 int_as_string_bitcount=None, iterable_as_array=False,
+                 array_line_length=None, object_on_newline=False,
+                 array_on_newline=False):
         """Constructor for JSONEncoder, with sensible defaults.
 
         If skipkeys is false, then it is a TypeError to attempt
@@ -224,6 +226,17 @@ class JSONEncoder(object):
         as ``null`` in compliance with the ECMA-262 specification. If true,
         this will override *allow_nan*.
 
+        If *array_line_length* is a positive integer (default: ``None``) and
+        *indent* is not ``None``, arrays that do not contain other arrays are
+        written on a single line whenever that line, brackets included, is
+        at most *array_line_length* characters long.
+
+        If *object_on_newline* (default: ``False``) or *array_on_newline*
+        (default: ``False``) is true and *indent* is not ``None``, an object
+        or an array that is the value of an object member starts on its own
+        line, indented like its key (Allman style), instead of after the
+        key separator.
+
         """
 
         self.skipkeys = skipkeys
@@ -240,6 +253,9 @@ class JSONEncoder(object):
         self.for_json = for_json
         self.ignore_nan = ignore_nan
         self.int_as_string_bitcount = int_as_string_bitcount
+        self.array_line_length = array_line_length
+        self.object_on_newline = object_on_newline
+        self.array_on_newline = array_on_newline
         if indent is not None and not isinstance(indent, string_types):
             indent = indent * ' '
         self.indent = indent
@@ -373,7 +389,9 @@ class JSONEncoder(object):
                 self.namedtuple_as_object, self.tuple_as_array,
                 int_as_string_bitcount,
                 self.item_sort_key, self.encoding, self.for_json,
-                self.iterable_as_array, Decimal=decimal.Decimal)
+                self.iterable_as_array, self.array_line_length,
+                self.object_on_newline, self.array_on_newline,
+                Decimal=decimal.Decimal)
         try:
             return _iterencode(o, 0)
         finally:
@@ -417,12 +435,26 @@ class JSONEncoderForHTML(JSONEncoder):
             yield chunk
 
 
+# Marks the end of the items of a container
+_END = object()
+
+
+class _NestedArray(Exception):
+    """Raised when an array that is being fitted on a single line turns
+    out to contain another array
+    """
+
+
 def _make_iterencode(markers, _default, _encoder, _indent, _floatstr,
         _key_separator, _item_separator, _sort_keys, _skipkeys, _one_shot,
         _use_decimal, _namedtuple_as_object, _tuple_as_array,
         _int_as_string_bitcount, _item_sort_key,
         _encoding,_for_json,
         _iterable_as_array,
+        _array_line_length=None,
+        _object_on_newline=False,
+        _array_on_newline=False,
+        _inline=False,
         ## HACK: hand-optimized bytecode; turn globals into locals
         _PY3=PY3,
         ValueError=ValueError,
@@ -450,6 +482,20 @@ def _make_iterencode(markers, _default, _encoder, _indent, _floatstr,
          not isinstance(_int_as_string_bitcount, integer_types))):
         raise TypeError("int_as_string_bitcount must be a positive integer")
 
+    if _array_line_length is not None and _indent is not None:
+        # Arrays are first encoded without indentation by a second encoder
+        # that gives up as soon as the line gets too long or another array
+        # shows up, so deciding costs at most _array_line_length characters.
+        _inline_markers = {} if markers is not None else None
+        _inline_iterencode = _make_iterencode(
+            _inline_markers, _default, _encoder, None, _floatstr,
+            _key_separator, _item_separator, _sort_keys, _skipkeys, _one_shot,
+            _use_decimal, _namedtuple_as_object, _tuple_as_array,
+            _int_as_string_bitcount, _item_sort_key, _encoding, _for_json,
+            _iterable_as_array, _inline=True, Decimal=Decimal)
+    else:
+        _inline_iterencode = None
+
     def _encode_int(value):
         skip_quoting = (
             _int_as_string_bitcount is None
@@ -468,78 +514,29 @@ def _make_iterencode(markers, _default, _encoder, _indent, _floatstr,
             return str(value)
         return '"' + str(value) + '"'
 
-    def _iterencode_list(lst, _current_indent_level):
-        if not lst:
-            yield '[]'
-            return
-        if markers is not None:
-            markerid = id(lst)
-            if markerid in markers:
-                raise ValueError("Circular reference detected")
-            markers[markerid] = lst
-        buf = '['
-        if _indent is not None:
-            _current_indent_level += 1
-            newline_indent = '\n' + (_indent * _current_indent_level)
-            separator = _item_separator + newline_indent
-            buf += newline_indent
-        else:
-            newline_indent = None
-            separator = _item_separator
+    def _inline_list(lst):
+        chunks = ['[']
+        length = 2
         first = True
-        for value in lst:
-            if first:
-                first = False
-            else:
-                buf = separator
-            if isinstance(value, string_types):
-                yield buf + _encoder(value)
-            elif _PY3 and isinstance(value, bytes) and _encoding is not None:
-                yield buf + _encoder(value)
-            elif isinstance(value, RawJSON):
-                yield buf + value.encoded_json
-            elif value is None:
-                yield buf + 'null'
-            elif value is True:
-                yield buf + 'true'
-            elif value is False:
-                yield buf + 'false'
-            elif isinstance(value, integer_types):
-                yield buf + _encode_int(value)
-            elif isinstance(value, float):
-                yield buf + _floatstr(value)
-            elif _use_decimal and isinstance(value, Decimal):
-                yield buf + str(value)
-            else:
-                yield buf
-                for_json = _for_json and getattr(value, 'for_json', None)
-                if for_json and callable(for_json):
-                    chunks = _iterencode(for_json(), _current_indent_level)
-                elif isinstance(value, list):
-                    chunks = _iterencode_list(value, _current_indent_level)
+        try:
+            for value in lst:
+                if first:
+                    first = False
                 else:
-                    _asdict = _namedtuple_as_object and getattr(value, '_asdict', None)
-                    if _asdict and callable(_asdict):
-                        chunks = _iterencode_dict(_asdict(),
-                                                  _current_indent_level)
-                    elif _tuple_as_array and isinstance(value, tuple):
-                        chunks = _iterencode_list(value, _current_indent_level)
-                    elif isinstance(value, dict):
-                        chunks = _iterencode_dict(value, _current_indent_level)
-                    else:
-                        chunks = _iterencode(value, _current_indent_level)
-                for chunk in chunks:
-                    yield chunk
-        if first:
-            # iterable_as_array misses the fast path at the top
-            yield '[]'
-        else:
-            if newline_indent is not None:
-                _current_indent_level -= 1
-                yield '\n' + (_indent * _current_indent_level)
-            yield ']'
-        if markers is not None:
-            del markers[markerid]
+                    chunks.append(_item_separator)
+                    length += len(_item_separator)
+                for chunk in _inline_iterencode(value, 0):
+                    length += len(chunk)
+                    if length > _array_line_length:
+                        return None
+                    chunks.append(chunk)
+        except _NestedArray:
+            return None
+        finally:
+            if _inline_markers:
+                _inline_markers.clear()
+        chunks.append(']')
+        return ''.join(chunks)
 
     def _stringify_key(key):
         if isinstance(key, string_types): # pragma: no cover
@@ -568,155 +565,290 @@ def _make_iterencode(markers, _default, _encoder, _indent, _floatstr,
                             'not %s' % key.__class__.__name__)
         return key
 
-    def _iterencode_dict(dct, _current_indent_level):
-        if not dct:
-            yield '{}'
-            return
-        if markers is not None:
-            markerid = id(dct)
-            if markerid in markers:
-                raise ValueError("Circular reference detected")
-            markers[markerid] = dct
-        yield '{'
-        if _indent is not None:
-            _current_indent_level += 1
-            newline_indent = '\n' + (_indent * _current_indent_level)
-            item_separator = _item_separator + newline_indent
-            yield newline_indent
-        else:
-            newline_indent = None
-            item_separator = _item_separator
-        first = True
-        if _PY3:
-            iteritems = dct.items()
-        else:
-            iteritems = dct.iteritems()
-        if _item_sort_key:
-            items = []
-            for k, v in dct.items():
-                if not isinstance(k, string_types):
-                    k = _stringify_key(k)
-                    if k is None:
-                        continue
-                items.append((k, v))
-            items.sort(key=_item_sort_key)
-        else:
-            items = iteritems
-        for key, value in items:
-            if not (_item_sort_key or isinstance(key, string_types)):
-                key = _stringify_key(key)
-                if key is None:
-                    # _skipkeys must be True
-                    continue
-            if first:
-                first = False
-            else:
-                yield item_separator
-            yield _encoder(key)
-            yield _key_separator
-            if isinstance(value, string_types):
-                yield _encoder(value)
-            elif _PY3 and isinstance(value, bytes) and _encoding is not None:
-                yield _encoder(value)
-            elif isinstance(value, RawJSON):
-                yield value.encoded_json
-            elif value is None:
-                yield 'null'
-            elif value is True:
-                yield 'true'
-            elif value is False:
-                yield 'false'
-            elif isinstance(value, integer_types):
-                yield _encode_int(value)
-            elif isinstance(value, float):
-                yield _floatstr(value)
-            elif _use_decimal and isinstance(value, Decimal):
-                yield str(value)
-            else:
-                for_json = _for_json and getattr(value, 'for_json', None)
-                if for_json and callable(for_json):
-                    chunks = _iterencode(for_json(), _current_indent_level)
-                elif isinstance(value, list):
-                    chunks = _iterencode_list(value, _current_indent_level)
-                else:
-                    _asdict = _namedtuple_as_object and getattr(value, '_asdict', None)
-                    if _asdict and callable(_asdict):
-                        chunks = _iterencode_dict(_asdict(),
-                                                  _current_indent_level)
-                    elif _tuple_as_array and isinstance(value, tuple):
-                        chunks = _iterencode_list(value, _current_indent_level)
-                    elif isinstance(value, dict):
-                        chunks = _iterencode_dict(value, _current_indent_level)
-                    else:
-                        chunks = _iterencode(value, _current_indent_level)
-                for chunk in chunks:
-                    yield chunk
-        if newline_indent is not None:
-            _current_indent_level -= 1
-            yield '\n' + (_indent * _current_indent_level)
-        yield '}'
-        if markers is not None:
-            del markers[markerid]
-
-    def _iterencode(o, _current_indent_level):
-        if isinstance(o, string_types):
-            yield _encoder(o)
-        elif _PY3 and isinstance(o, bytes) and _encoding is not None:
-            yield _encoder(o)
-        elif isinstance(o, RawJSON):
-            yield o.encoded_json
-        elif o is None:
-            yield 'null'
-        elif o is True:
-            yield 'true'
-        elif o is False:
-            yield 'false'
-        elif isinstance(o, integer_types):
-            yield _encode_int(o)
-        elif isinstance(o, float):
-            yield _floatstr(o)
-        else:
+    def _resolve(o):
+        # Returns (text, None, False, defaulted) for a value written as is,
+        # or (None, container, is_dict, defaulted) for an object or array.
+        # defaulted lists the markers of the objects passed to default(),
+        # which stay set until their replacement is written.
+        defaulted = None
+        while True:
+            if isinstance(o, string_types):
+                return _encoder(o), None, False, defaulted
+            elif _PY3 and isinstance(o, bytes) and _encoding is not None:
+                return _encoder(o), None, False, defaulted
+            elif isinstance(o, RawJSON):
+                return o.encoded_json, None, False, defaulted
+            elif o is None:
+                return 'null', None, False, defaulted
+            elif o is True:
+                return 'true', None, False, defaulted
+            elif o is False:
+                return 'false', None, False, defaulted
+            elif isinstance(o, integer_types):
+                return _encode_int(o), None, False, defaulted
+            elif isinstance(o, float):
+                return _floatstr(o), None, False, defaulted
             for_json = _for_json and getattr(o, 'for_json', None)
             if for_json and callable(for_json):
-                for chunk in _iterencode(for_json(), _current_indent_level):
-                    yield chunk
+                o = for_json()
+                continue
             elif isinstance(o, list):
-                for chunk in _iterencode_list(o, _current_indent_level):
-                    yield chunk
-            else:
-                _asdict = _namedtuple_as_object and getattr(o, '_asdict', None)
-                if _asdict and callable(_asdict):
-                    for chunk in _iterencode_dict(_asdict(),
-                            _current_indent_level):
-                        yield chunk
-                elif (_tuple_as_array and isinstance(o, tuple)):
-                    for chunk in _iterencode_list(o, _current_indent_level):
-                        yield chunk
-                elif isinstance(o, dict):
-                    for chunk in _iterencode_dict(o, _current_indent_level):
-                        yield chunk
-                elif _use_decimal and isinstance(o, Decimal):
-                    yield str(o)
+                return None, o, False, defaulted
+            _asdict = _namedtuple_as_object and getattr(o, '_asdict', None)
+            if _asdict and callable(_asdict):
+                return None, _asdict(), True, defaulted
+            elif _tuple_as_array and isinstance(o, tuple):
+                return None, o, False, defaulted
+            elif isinstance(o, dict):
+                return None, o, True, defaulted
+            elif _use_decimal and isinstance(o, Decimal):
+                return str(o), None, False, defaulted
+            if _iterable_as_array:
+                # Markers are not checked here because it is valid for
+                # an iterable to return self.
+                try:
+                    return None, iter(o), False, defaulted
+                except TypeError:
+                    pass
+            if markers is not None:
+                markerid = id(o)
+                if markerid in markers:
+                    raise ValueError("Circular reference detected")
+                markers[markerid] = o
+                if defaulted is None:
+                    defaulted = []
+                defaulted.append(markerid)
+            o = _default(o)
+
+    def _release(defaulted):
+        for markerid in defaulted:
+            del markers[markerid]
+
+    def _iterencode(o, _current_indent_level):
+        # Objects and arrays are walked with an explicit stack rather than
+        # by nested generators, so neither deep documents nor the number
+        # of frames every chunk passes through are limited by recursion.
+        # Chunks are joined into blocks of up to flush_size pieces.
+        flush_size = 1 if _inline else 8192
+        chunks = []
+        append = chunks.append
+        stack = []
+        # State of the innermost open container, saved on the stack
+        # while one of its values is written
+        items = None
+        is_object = first = False
+        separator = newline_indent = opening = key_separator = None
+        markerid = defaulted = None
+        level = _current_indent_level
+
+        text, container, container_is_object, container_defaulted = \
+            _resolve(o)
+        if text is not None:
+            append(text)
+            if container_defaulted:
+                _release(container_defaulted)
+        while True:
+            if container is not None:
+                if container_is_object:
+                    if not container:
+                        append('{}')
+                        container = None
+                else:
+                    if _inline:
+                        raise _NestedArray
+                    if not container:
+                        append('[]')
+                        container = None
+                    elif (_inline_iterencode is not None and
+                            isinstance(container, (list, tuple))):
+                        line = _inline_list(container)
+                        if line is not None:
+                            append(line)
+                            container = None
+                if container is None:
+                    if container_defaulted:
+                        _release(container_defaulted)
                 else:
-                    while _iterable_as_array:
-                        # Markers are not checked here because it is valid for
-                        # an iterable to return self.
-                        try:
-                            o = iter(o)
-                        except TypeError:
-                            break
-                        for chunk in _iterencode_list(o, _current_indent_level):
-                            yield chunk
-                        return
                     if markers is not None:
-                        markerid = id(o)
-                        if markerid in markers:
+                        container_id = id(container)
+                        if container_id in markers:
                             raise ValueError("Circular reference detected")
-                        markers[markerid] = o
-                    o = _default(o)
-                    for chunk in _iterencode(o, _current_indent_level):
-                        yield chunk
-                    if markers is not None:
-                        del markers[markerid]
+                        markers[container_id] = container
+                    else:
+                        container_id = None
+                    if items is not None:
+                        stack.append((
+                            items, is_object, first, separator,
+                            newline_indent, opening, key_separator,
+                            markerid, defaulted, level))
+                    if _indent is not None:
+                        level += 1
+                        newline_indent = '\n' + (_indent * level)
+                        separator = _item_separator + newline_indent
+                    else:
+                        newline_indent = None
+                        separator = _item_separator
+                    is_object = container_is_object
+                    markerid = container_id
+                    defaulted = container_defaulted
+                    first = True
+                    if is_object:
+                        append('{')
+                        if newline_indent is not None:
+                            append(newline_indent)
+                        if newline_indent is not None and (
+                                _object_on_newline or _array_on_newline):
+                            key_separator = (_key_separator.rstrip() +
+                                             newline_indent)
+                        else:
+                            key_separator = None
+                        if _item_sort_key:
+                            items = []
+                            for k, v in container.items():
+                                if not isinstance(k, string_types):
+                                    k = _stringify_key(k)
+                                    if k is None:
+                                        continue
+                                items.append((k, v))
+                            items.sort(key=_item_sort_key)
+                            items = iter(items)
+                        elif _PY3:
+                            items = iter(container.items())
+                        else:
+                            items = container.iteritems()
+                    else:
+                        # Only written once the array has an item, since
+                        # iterable_as_array may find it empty
+                        opening = '['
+                        if newline_indent is not None:
+                            opening += newline_indent
+                        items = iter(container)
+                    container = None
+            if items is None:
+                break
+            if len(chunks) >= flush_size:
+                yield ''.join(chunks)
+                del chunks[:]
+
+            if is_object:
+                for key, value in items:
+                    if not (_item_sort_key or
+                            isinstance(key, string_types)):
+                        key = _stringify_key(key)
+                        if key is None:
+                            # _skipkeys must be True
+                            continue
+                    break
+                else:
+                    if newline_indent is not None:
+                        append('\n' + (_indent * (level - 1)))
+                    append('}')
+                    value = _END
+                if value is not _END:
+                    if first:
+                        first = False
+                    else:
+                        append(separator)
+                    append(_encoder(key))
+                    if isinstance(value, string_types):
+                        append(_key_separator + _encoder(value))
+                    elif (_PY3 and isinstance(value, bytes) and
+                            _encoding is not None):
+                        append(_key_separator + _encoder(value))
+                    elif isinstance(value, RawJSON):
+                        append(_key_separator + value.encoded_json)
+                    elif value is None:
+                        append(_key_separator + 'null')
+                    elif value is True:
+                        append(_key_separator + 'true')
+                    elif value is False:
+                        append(_key_separator + 'false')
+                    elif isinstance(value, integer_types):
+                        append(_key_separator + _encode_int(value))
+                    elif isinstance(value, float):
+                        append(_key_separator + _floatstr(value))
+                    elif _use_decimal and isinstance(value, Decimal):
+                        append(_key_separator + str(value))
+                    else:
+                        (text, container, container_is_object,
+                         container_defaulted) = _resolve(value)
+                        if key_separator is None:
+                            append(_key_separator)
+                        else:
+                            # Objects and arrays may go on their own line
+                            if container is None:
+                                start = text[:1]
+                            elif container_is_object:
+                                start = '{'
+                            else:
+                                start = '['
+                            if ((_object_on_newline and start == '{') or
+                                    (_array_on_newline and start == '[')):
+                                append(key_separator)
+                            else:
+                                append(_key_separator)
+                        if text is not None:
+                            append(text)
+                            if container_defaulted:
+                                _release(container_defaulted)
+                    continue
+            else:
+                for value in items:
+                    break
+                else:
+                    if first:
+                        # iterable_as_array misses the fast path above
+                        append('[]')
+                    else:
+                        if newline_indent is not None:
+                            append('\n' + (_indent * (level - 1)))
+                        append(']')
+                    value = _END
+                if value is not _END:
+                    if first:
+                        first = False
+                        append(opening)
+                    else:
+                        append(separator)
+                    if isinstance(value, string_types):
+                        append(_encoder(value))
+                    elif (_PY3 and isinstance(value, bytes) and
+                            _encoding is not None):
+                        append(_encoder(value))
+                    elif isinstance(value, RawJSON):
+                        append(value.encoded_json)
+                    elif value is None:
+                        append('null')
+                    elif value is True:
+                        append('true')
+                    elif value is False:
+                        append('false')
+                    elif isinstance(value, integer_types):
+                        append(_encode_int(value))
+                    elif isinstance(value, float):
+                        append(_floatstr(value))
+                    elif _use_decimal and isinstance(value, Decimal):
+                        append(str(value))
+                    else:
+                        (text, container, container_is_object,
+                         container_defaulted) = _resolve(value)
+                        if text is not None:
+                            append(text)
+                            if container_defaulted:
+                                _release(container_defaulted)
+                    continue
+
+            # The container is closed
+            if markerid is not None:
+                del markers[markerid]
+            if defaulted:
+                _release(defaulted)
+            if not stack:
+                break
+            (items, is_object, first, separator, newline_indent, opening,
+             key_separator, markerid, defaulted, level) = stack.pop()
+
+        if chunks:
+            yield ''.join(chunks)
 
     return _iterencode
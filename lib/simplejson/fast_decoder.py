@@ -0,0 +1,214 @@
+"""Fast path JSONDecoder for documents made of objects and arrays
+"""
+from __future__ import absolute_import
+import re
+from .compat import PY3, text_type
+from .decoder import JSONDecoder, LocatedKey, WHITESPACE
+
+__all__ = ['FastJSONDecoder']
+
+# A plain value (no escapes in strings, no NaN/Infinity) followed by the
+# separator that comes after it, in a single match
+_VALUE = (
+    r'(?:"([^"\\\x00-\x1f]*)"'
+    r'|(-?(?:0|[1-9]\d*))(\.\d+)?([eE][-+]?\d+)?'
+    r'|(true|false|null))'
+    r'[ \t\n\r]*([,\]}])?[ \t\n\r]*')
+# An object key without escapes together with the ':' delimiter
+_KEY = r'[ \t\n\r]*"([^"\\\x00-\x1f]*)"[ \t\n\r]*:[ \t\n\r]*'
+VALUE = re.compile(_VALUE)
+KEY = re.compile(_KEY)
+MEMBER = re.compile(_KEY + _VALUE)
+COLON = re.compile(r'[ \t\n\r]*:[ \t\n\r]*')
+SEPARATOR = re.compile(r'[ \t\n\r]*([,\]}])?[ \t\n\r]*')
+
+_CONSTANTS = {'true': True, 'false': False, 'null': None}
+
+
+def make_fast_scanner(context):
+    """Return a function that decodes the object or array starting at
+    index ``end`` without recursion, or returns ``None`` when the document needs
+    the generic scanner (errors, top-level scalars, ``NaN``/``Infinity``,
+    empty top-level containers)."""
+    parse_string = context.parse_string
+    encoding = context.encoding
+    strict = context.strict
+    parse_float = context.parse_float
+    parse_int = context.parse_int
+    object_hook = context.object_hook
+    object_pairs_hook = context.object_pairs_hook
+    located = context.locate_keys
+    match_value = VALUE.match
+    match_key = KEY.match
+    match_member = MEMBER.match
+    match_colon = COLON.match
+    match_separator = SEPARATOR.match
+    match_whitespace = WHITESPACE.match
+    constants = _CONSTANTS
+
+    def finish_object(pairs):
+        if object_pairs_hook is not None:
+            return object_pairs_hook(pairs)
+        pairs = dict(pairs)
+        if object_hook is not None:
+            pairs = object_hook(pairs)
+        return pairs
+
+    def scan(s, end):
+        nextchar = s[end:end + 1]
+        if nextchar != '{' and nextchar != '[':
+            return None
+        is_object = nextchar == '{'
+        end = match_whitespace(s, end + 1).end()
+        if s[end:end + 1] == ('}' if is_object else ']'):
+            return None
+        memo = {}
+        memo_get = memo.setdefault
+        stack = []
+        values = []
+        append = values.append
+        key = None
+        while True:
+            # Object members and array items made of a plain value are
+            # decoded from a single match; the value conversion is written
+            # out twice to keep function calls out of this loop.
+            if is_object:
+                m = match_member(s, end)
+                if m is not None:
+                    key, string, integer, frac, exp, constant, sep = m.groups()
+                    if string is not None:
+                        value = string
+                    elif integer is not None:
+                        if frac or exp:
+                            value = parse_float(integer + (frac or '') + (exp or ''))
+                        else:
+                            value = parse_int(integer)
+                    else:
+                        value = constants[constant]
+                    if located:
+                        append((LocatedKey(key, m.start(1) - 1, m.end(1) + 1), value))
+                    else:
+                        append((memo_get(key, key), value))
+                    end = m.end()
+                    if sep == ',':
+                        continue
+                else:
+                    m = match_key(s, end)
+                    if m is not None:
+                        key = m.group(1)
+                        if located:
+                            key = LocatedKey(key, m.start(1) - 1, m.end(1) + 1)
+                        end = m.end()
+                    elif s[end:end + 1] == '"':
+                        offset = end
+                        key, end = parse_string(s, end + 1, encoding, strict)
+                        if located:
+                            key = LocatedKey(key, offset, end)
+                        m = match_colon(s, end)
+                        if m is None:
+                            return None
+                        end = m.end()
+                    else:
+                        return None
+                    if not located:
+                        key = memo_get(key, key)
+                    m = None
+            else:
+                m = match_value(s, end)
+                if m is not None:
+                    string, integer, frac, exp, constant, sep = m.groups()
+                    if string is not None:
+                        if located:
+                            value = LocatedKey(string, m.start(1) - 1, m.end(1) + 1)
+                        else:
+                            value = string
+                    elif integer is not None:
+                        if frac or exp:
+                            value = parse_float(integer + (frac or '') + (exp or ''))
+                        else:
+                            value = parse_int(integer)
+                    else:
+                        value = constants[constant]
+                    append(value)
+                    end = m.end()
+                    if sep == ',':
+                        continue
+
+            if m is None:
+                # Strings with escapes and nested containers
+                nextchar = s[end:end + 1]
+                if nextchar == '"':
+                    offset = end
+                    value, end = parse_string(s, end + 1, encoding, strict)
+                    if located and not is_object:
+                        value = LocatedKey(value, offset, end)
+                elif nextchar == '{' or nextchar == '[':
+                    end = match_whitespace(s, end + 1).end()
+                    if s[end:end + 1] != ('}' if nextchar == '{' else ']'):
+                        stack.append((values, is_object, key))
+                        values = []
+                        append = values.append
+                        is_object = nextchar == '{'
+                        continue
+                    value = finish_object([]) if nextchar == '{' else []
+                    end += 1
+                else:
+                    return None
+                if is_object:
+                    append((key, value))
+                else:
+                    append(value)
+                m = match_separator(s, end)
+                sep = m.group(1)
+                end = m.end()
+                if sep == ',':
+                    continue
+
+            # Close every container that ends here
+            while True:
+                if sep != ('}' if is_object else ']'):
+                    return None
+                if is_object:
+                    value = finish_object(values)
+                else:
+                    value = values
+                if not stack:
+                    return value, m.end(m.lastindex)
+                values, is_object, key = stack.pop()
+                append = values.append
+                if is_object:
+                    append((key, value))
+                else:
+                    append(value)
+                m = match_separator(s, end)
+                sep = m.group(1)
+                end = m.end()
+                if sep == ',':
+                    break
+
+    return scan
+
+
+class FastJSONDecoder(JSONDecoder):
+    """JSONDecoder that decodes objects and arrays with an explicit stack
+    and whole-token regular expressions instead of one function call per
+    value.
+
+    The result is identical to :class:`JSONDecoder` with the same options.
+    Anything the fast path does not handle, including every invalid
+    document, is handed to :meth:`JSONDecoder.raw_decode`, so errors are
+    reported exactly as before.  Since it does not recurse, deeply nested
+    documents do not hit the recursion limit.
+
+    """
+
+    def __init__(self, *args, **kw):
+        super(FastJSONDecoder, self).__init__(*args, **kw)
+        self.fast_scan = make_fast_scanner(self)
+
+    def raw_decode(self, s, idx=0, _w=WHITESPACE.match, _PY3=PY3):
+        if idx >= 0 and isinstance(s, text_type) and s[idx:idx + 1] != u'\ufeff':
+            result = self.fast_scan(s, _w(s, idx).end())
+            if result is not None:
+                return result
+        return JSONDecoder.raw_decode(self, s, idx)
@@ -5,5 +5,7 @@ class RawJSON(object):
     """Wrap an encoded JSON document for direct embedding in the output
 
     """
+    __slots__ = ('encoded_json',)
+
     def __init__(self, encoded_json):
         self.encoded_json = encoded_json
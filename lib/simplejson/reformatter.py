@@ -0,0 +1,202 @@
+"""Re-indent a JSON document token by token, without decoding it
+"""
+from __future__ import absolute_import
+import re
+from .compat import string_types
+from .decoder import JSONDecoder, scanstring
+from .encoder import encode_basestring, encode_basestring_ascii
+from .errors import JSONDecodeError
+
+__all__ = ['iterreformat', 'reformat']
+
+# One token and the whitespace before it. Every alternative is a single
+# group so that m.lastindex tells which kind of token matched.
+TOKEN = re.compile(
+    r'[ \t\n\r]*(?:'
+    r'("[^"\\\x00-\x1f]*")'                                  # 1 plain string
+    r'|(-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?)'       # 2 number
+    r'|(true|false|null|NaN|Infinity|-Infinity)'             # 3 constant
+    r'|([{\[])'                                              # 4 open
+    r'|([}\]])'                                              # 5 close
+    r'|(,)'                                                  # 6 comma
+    r'|(:)'                                                  # 7 colon
+    r'|(")'                                                  # 8 escaped string
+    r'|(\Z)'                                                 # 9 end
+    r')')
+NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+(_PLAIN_STRING, _NUMBER, _CONSTANT, _OPEN, _CLOSE, _COMMA, _COLON,
+ _STRING, _END) = range(1, 10)
+
+# Parser states
+(_VALUE, _MEMBER_VALUE, _ITEM_OR_CLOSE, _KEY, _KEY_OR_CLOSE, _COLON_NEXT,
+ _NEXT, _DONE) = range(8)
+
+
+def _raise_error(s, pos):
+    # Let the regular decoder report the error so the message is the same
+    # as for every other command
+    JSONDecoder().decode(s)
+    raise JSONDecodeError('Expecting value', s, pos)
+
+
+def iterreformat(s, indent=None, separators=None, ensure_ascii=True,
+                 object_on_newline=False, array_on_newline=False,
+                 chunk_size=8192):
+    """Yield the JSON document ``s`` re-indented as :class:`JSONEncoder`
+    would write it with the same options, in chunks of roughly
+    ``chunk_size`` tokens.
+
+    The document is never decoded: numbers and constants are copied
+    verbatim, and strings are only re-encoded when they contain escapes or
+    when *ensure_ascii* requires it. Memory use is constant apart from the
+    stack of open containers. Object members keep their order and
+    duplicate keys are kept as they are.
+
+    Invalid documents raise the same :class:`JSONDecodeError` as
+    :meth:`JSONDecoder.decode`, possibly after some chunks were yielded.
+
+    """
+    if indent is not None and not isinstance(indent, string_types):
+        indent = indent * ' '
+    if separators is not None:
+        item_separator, key_separator = separators
+    elif indent is not None:
+        item_separator, key_separator = ',', ': '
+    else:
+        item_separator, key_separator = ', ', ': '
+    encoder = encode_basestring_ascii if ensure_ascii else encode_basestring
+    if indent is not None and (object_on_newline or array_on_newline):
+        newline_key_separator = key_separator.rstrip()
+    else:
+        newline_key_separator = None
+
+    newlines = ['\n']
+
+    def newline(level):
+        while len(newlines) <= level:
+            newlines.append('\n' + indent * len(newlines))
+        return newlines[level]
+
+    match = TOKEN.match
+    non_ascii = NON_ASCII.search
+    chunks = []
+    emit = chunks.append
+    stack = []
+    level = 0
+    state = _VALUE
+    pos = 1 if s[:1] == u'\ufeff' else 0
+    while True:
+        if len(chunks) >= chunk_size:
+            yield ''.join(chunks)
+            del chunks[:]
+        m = match(s, pos)
+        if m is None:
+            _raise_error(s, pos)
+        kind = m.lastindex
+        pos = m.end()
+
+        if state == _NEXT:
+            if kind == _COMMA:
+                if indent is None:
+                    emit(item_separator)
+                else:
+                    emit(item_separator + newline(level))
+                state = _KEY if stack[-1] else _VALUE
+                continue
+            if kind == _CLOSE and (m.group(_CLOSE) == '}') == stack[-1]:
+                stack.pop()
+                level -= 1
+                if indent is None:
+                    emit(m.group(_CLOSE))
+                else:
+                    emit(newline(level) + m.group(_CLOSE))
+                state = _NEXT if stack else _DONE
+                continue
+            _raise_error(s, m.start(kind))
+
+        if state == _KEY or state == _KEY_OR_CLOSE:
+            if kind == _PLAIN_STRING:
+                text = m.group(_PLAIN_STRING)
+                if ensure_ascii and non_ascii(text):
+                    text = encoder(text[1:-1])
+            elif kind == _STRING:
+                text, pos = scanstring(s, pos)
+                text = encoder(text)
+            elif (kind == _CLOSE and state == _KEY_OR_CLOSE and
+                    m.group(_CLOSE) == '}'):
+                # Empty object
+                stack.pop()
+                level -= 1
+                emit('}')
+                state = _NEXT if stack else _DONE
+                continue
+            else:
+                _raise_error(s, m.start(kind))
+            if state == _KEY_OR_CLOSE and indent is not None:
+                emit(newline(level) + text)
+            else:
+                emit(text)
+            state = _COLON_NEXT
+            continue
+
+        if state == _COLON_NEXT:
+            if kind != _COLON:
+                _raise_error(s, m.start(kind))
+            state = _MEMBER_VALUE
+            continue
+
+        if state == _DONE:
+            if kind != _END:
+                _raise_error(s, m.start(kind))
+            break
+
+        # A value is expected: _VALUE, _MEMBER_VALUE or _ITEM_OR_CLOSE
+        if state == _MEMBER_VALUE:
+            prefix = key_separator
+        elif state == _ITEM_OR_CLOSE and indent is not None:
+            prefix = newline(level)
+        else:
+            prefix = ''
+
+        if kind == _PLAIN_STRING:
+            text = m.group(_PLAIN_STRING)
+            if ensure_ascii and non_ascii(text):
+                text = encoder(text[1:-1])
+        elif kind == _NUMBER or kind == _CONSTANT:
+            text = m.group(kind)
+        elif kind == _STRING:
+            text, pos = scanstring(s, pos)
+            text = encoder(text)
+        elif kind == _OPEN:
+            text = m.group(_OPEN)
+            is_object = text == '{'
+            if (state == _MEMBER_VALUE and newline_key_separator is not None
+                    and (object_on_newline if is_object else array_on_newline)):
+                prefix = newline_key_separator + newline(level)
+            emit(prefix + text)
+            stack.append(is_object)
+            level += 1
+            state = _KEY_OR_CLOSE if is_object else _ITEM_OR_CLOSE
+            continue
+        elif (kind == _CLOSE and state == _ITEM_OR_CLOSE and
+                m.group(_CLOSE) == ']'):
+            # Empty array
+            stack.pop()
+            level -= 1
+            emit(']')
+            state = _NEXT if stack else _DONE
+            continue
+        else:
+            _raise_error(s, m.start(kind))
+        emit(prefix + text)
+        state = _NEXT if stack else _DONE
+
+    if chunks:
+        yield ''.join(chunks)
+
+
+def reformat(s, **kw):
+    """Return the JSON document ``s`` re-indented, see :func:`iterreformat`
+    for the options"""
+    return ''.join(iterreformat(s, **kw))
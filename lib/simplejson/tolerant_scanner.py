@@ -0,0 +1,299 @@
+"""Find every syntax error of a JSON document in one pass
+"""
+from __future__ import absolute_import
+import re
+from .decoder import scanstring
+from .errors import JSONDecodeError
+from .reformatter import TOKEN
+
+__all__ = ['scan_errors', 'Grammar', 'scan']
+
+# Tokens are matched with the reformatter's TOKEN, so that both tokenize
+# documents the same way. This is how it matches plain strings.
+_PLAIN_STRING_PATTERN = r'"[^"\\\x00-\x1f]*"'
+_WS = r'[ \t\n\r]*'
+_SCALAR = (
+    r'(?:%s'
+    r'|-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?'
+    r'|true|false|null|NaN|Infinity|-Infinity)')
+# Scalars skipped at most at once, so that progress is reported within
+# long arrays and objects
+_RUN_LENGTH = 1024
+# What error recovery skips over: strings, brackets and commas
+_SKIP = r'"(?:[^"\\\n]|\\.)*"|[\[\]{},]|\Z'
+# A string with invalid escapes or control characters still ends at the
+# next unescaped quote
+_LENIENT_STRING = r'(?:[^"\\]|\\.)*"'
+
+(_PLAIN_STRING, _NUMBER, _CONSTANT, _OPEN, _CLOSE, _COMMA, _COLON,
+ _STRING, _END) = range(1, 10)
+
+# Parser states
+(_VALUE, _ITEM_OR_CLOSE, _KEY, _KEY_OR_CLOSE, _COLON_NEXT, _NEXT,
+ _DONE) = range(7)
+
+
+class Grammar(object):
+    """The regular expressions :func:`scan` matches, for documents of
+    ``str`` or of ``bytes``.
+
+    *plain_string* matches the strings that are valid without a closer look
+    and *encode* turns a pattern into the document's type.
+    *read_string* is called as ``read_string(s, start, endpos, progress,
+    progress_step)`` for any other string starting at *start*; it returns
+    the index after the string (``None`` if scanning cannot go on after
+    it), the error tuple of the string or ``None``, and the decoded string
+    or ``None``.
+
+    """
+    def __init__(self, plain_string, encode, read_string):
+        def compile(pattern, flags=0):
+            return re.compile(encode(pattern), flags)
+        scalar = _SCALAR % (plain_string,)
+        member = r'%s%s:%s%s' % (plain_string, _WS, _WS, scalar)
+        run = r'(?:%s,%s%%s){0,%d}' % (_WS, _WS, _RUN_LENGTH)
+        self.token = compile(
+            TOKEN.pattern.replace(_PLAIN_STRING_PATTERN, plain_string, 1))
+        # Runs of scalar members of an object or items of an array, matched
+        # at once since the checks between them are the same
+        self.members = compile(run % (member,))
+        self.items = compile(run % (scalar,))
+        # The same, starting with the first member or item
+        self.first_members = compile(_WS + member + run % (member,))
+        self.first_items = compile(_WS + scalar + run % (scalar,))
+        self.skip = compile(_SKIP)
+        self.lenient_string = compile(_LENIENT_STRING, re.DOTALL)
+        self.whitespace = compile(_WS)
+        self.open_brackets = encode('[{')
+        self.close_brackets = encode(']}')
+        self.open_object = encode('{')
+        self.close_object = encode('}')
+        self.close_array = encode(']')
+        self.comma = encode(',')
+        self.read_string = read_string
+
+
+def _read_string(s, start, endpos, progress, progress_step):
+    # Strings with escapes are decoded to find their end
+    try:
+        key, pos = scanstring(s, start + 1)
+    except ValueError as ex:
+        if isinstance(ex, JSONDecodeError):
+            error = (ex.msg, ex.pos, ex.end)
+        else:
+            # e.g. a \u escape out of range, which the decoder does not
+            # check either
+            error = (str(ex), start)
+        lenient = STR_GRAMMAR.lenient_string.match(s, start + 1, endpos)
+        if error[0].startswith('Unterminated') or lenient is None:
+            return None, error, None
+        return lenient.end(), error, None
+    return pos, None, key
+
+
+STR_GRAMMAR = Grammar(
+    _PLAIN_STRING_PATTERN, lambda pattern: pattern, _read_string)
+
+
+def scan_errors(s, check_duplicates=False, max_errors=100):
+    """Return a list with a :class:`JSONDecodeError` for every syntax error
+    of the JSON document ``s``, in document order, or an empty list if it
+    is valid.
+
+    The first error is the one :meth:`JSONDecoder.decode` raises. After an
+    error the scanner skips to the next ``,``, ``}`` or ``]`` of the
+    enclosing container and goes on from there, so one parse finds the
+    errors of every broken member. Nothing is decoded apart from keys when
+    *check_duplicates* is true, which also reports repeated keys of an
+    object. Scanning stops after *max_errors* errors.
+
+    """
+    found = []
+    pos = 1 if s[:1] == u'\ufeff' else 0
+    scan(STR_GRAMMAR, s, pos, len(s), found, max_errors, check_duplicates)
+    return [JSONDecodeError(error[0], s, *error[1:]) for error in found]
+
+
+def scan(grammar, s, pos, endpos, found, max_errors,
+         check_duplicates=False, progress=None, progress_step=None):
+    """The tolerant scanner over ``s[pos:endpos]``, appending a tuple
+    ``(message, offset)`` or ``(message, offset, end)`` to *found* for
+    every error.
+
+    *progress* is called with the offset reached about every
+    *progress_step* characters; whatever it raises stops the scan.
+
+    """
+    match = grammar.token.match
+    skip = grammar.skip.search
+    whitespace = grammar.whitespace.match
+    members = grammar.members.match
+    items = grammar.items.match
+    first_members = grammar.first_members.match
+    first_items = grammar.first_items.match
+    read_string = grammar.read_string
+    open_brackets = grammar.open_brackets
+    close_brackets = grammar.close_brackets
+    open_object = grammar.open_object
+    close_object = grammar.close_object
+    close_array = grammar.close_array
+    comma = grammar.comma
+    stack = []
+    keys = []
+    state = _VALUE
+    if progress is None:
+        progress_step = endpos + 1
+    next_progress = pos + progress_step
+
+    while True:
+        if pos >= next_progress:
+            progress(pos)
+            next_progress = pos + progress_step
+        # Keys are looked at one by one when duplicates are checked
+        if state == _NEXT:
+            if not stack[-1]:
+                pos = items(s, pos, endpos).end()
+            elif not check_duplicates:
+                pos = members(s, pos, endpos).end()
+        elif state == _KEY_OR_CLOSE or state == _KEY:
+            if not check_duplicates:
+                m = first_members(s, pos, endpos)
+                if m is not None:
+                    pos = m.end()
+                    state = _NEXT
+        elif state == _ITEM_OR_CLOSE:
+            m = first_items(s, pos, endpos)
+            if m is not None:
+                pos = m.end()
+                state = _NEXT
+        m = match(s, pos, endpos)
+        if m is None:
+            kind = None
+            start = whitespace(s, pos, endpos).end()
+        else:
+            kind = m.lastindex
+            start = m.start(kind)
+            pos = m.end()
+        error = None
+
+        if kind == _STRING:
+            end, error, key = read_string(
+                s, start, endpos, progress, progress_step)
+            if end is None:
+                kind = None
+            else:
+                pos = end
+        elif kind == _PLAIN_STRING and check_duplicates:
+            key = m.group(_PLAIN_STRING)[1:-1]
+
+        if state == _NEXT:
+            if kind == _COMMA:
+                state = _KEY if stack[-1] else _VALUE
+                continue
+            if kind == _CLOSE and (m.group(_CLOSE) == close_object) == stack[-1]:
+                stack.pop()
+                keys.pop()
+                state = _NEXT if stack else _DONE
+                continue
+            if stack[-1]:
+                error = "Expecting ',' delimiter or '}'"
+            else:
+                error = "Expecting ',' delimiter or ']'"
+
+        elif state == _KEY or state == _KEY_OR_CLOSE:
+            if kind == _PLAIN_STRING or kind == _STRING:
+                if error is not None:
+                    found.append(error)
+                    error = None
+                elif check_duplicates:
+                    if key in keys[-1]:
+                        found.append(('Duplicate key specified: ' + key, start))
+                    else:
+                        keys[-1].add(key)
+                state = _COLON_NEXT
+            elif (kind == _CLOSE and state == _KEY_OR_CLOSE and
+                    m.group(_CLOSE) == close_object):
+                # Empty object
+                stack.pop()
+                keys.pop()
+                state = _NEXT if stack else _DONE
+                continue
+            elif error is None:
+                error = 'Expecting property name enclosed in double quotes'
+
+        elif state == _COLON_NEXT:
+            if kind == _COLON:
+                state = _VALUE
+                continue
+            error = "Expecting ':' delimiter"
+
+        elif state == _DONE:
+            if kind != _END:
+                found.append(('Extra data', start, endpos))
+            break
+
+        # A value is expected: _VALUE or _ITEM_OR_CLOSE
+        elif kind in (_PLAIN_STRING, _STRING, _NUMBER, _CONSTANT):
+            if error is not None:
+                found.append(error)
+                error = None
+            state = _NEXT if stack else _DONE
+        elif kind == _OPEN:
+            is_object = m.group(_OPEN) == open_object
+            stack.append(is_object)
+            keys.append(set() if is_object and check_duplicates else None)
+            state = _KEY_OR_CLOSE if is_object else _ITEM_OR_CLOSE
+        elif (kind == _CLOSE and state == _ITEM_OR_CLOSE and
+                m.group(_CLOSE) == close_array):
+            # Empty array
+            stack.pop()
+            keys.pop()
+            state = _NEXT if stack else _DONE
+        elif kind == _END and state == _ITEM_OR_CLOSE:
+            error = "Expecting value or ']'"
+        elif error is None:
+            error = 'Expecting value'
+
+        if error is None:
+            if len(found) >= max_errors:
+                del found[max_errors:]
+                break
+            continue
+
+        if not isinstance(error, tuple):
+            error = (error, start)
+        found.append(error)
+        if not stack or len(found) >= max_errors:
+            break
+
+        # Resynchronize on the next comma or closing bracket of an open
+        # container, skipping strings and nested containers
+        pos = error[1]
+        depth = 0
+        while True:
+            m = skip(s, pos, endpos)
+            token = m.group()
+            pos = m.end()
+            if not token:
+                break
+            if token in open_brackets:
+                depth += 1
+            elif token in close_brackets:
+                if depth:
+                    depth -= 1
+                    continue
+                is_object = token == close_object
+                if is_object in stack:
+                    # Containers left open in between are closed as well
+                    while stack.pop() != is_object:
+                        keys.pop()
+                    keys.pop()
+                    break
+            elif token == comma and not depth:
+                break
+        if not token:
+            break
+        if token == comma:
+            state = _KEY if stack[-1] else _VALUE
+        else:
+            state = _NEXT if stack else _DONE
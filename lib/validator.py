@@ -0,0 +1,171 @@
+"""
+Validates successive versions of a JSON document, such as a file on every
+save, by re-parsing only the innermost container that encloses what changed
+since the last valid version.
+
+The text outside that container is identical and the container still parses
+into a single value ending at its closing bracket, so the document is valid
+exactly when a full parse says so. Whenever that cannot be shown, the whole
+document is parsed again, which also reports errors exactly as a full parse.
+"""
+import re
+from array import array
+from bisect import bisect_left
+
+__all__ = ["IncrementalValidator", "index_containers"]
+
+BRACKET = re.compile(r"[\[\]{}]")
+QUOTE_OR_ESCAPE = re.compile(r'\\.|"', re.DOTALL)
+
+
+def index_containers(text: str, begin: int = 0, end: int = None):
+    """
+    Return the start offsets, end offsets (of the closing bracket) and
+    parent positions of the objects and arrays of the valid JSON text
+    between begin and end, in document order. Top level containers have
+    -1 as parent.
+    """
+    if end is None:
+        end = len(text)
+    starts = array("q")
+    ends = array("q")
+    parents = array("q")
+    stack = list()
+    count = text.count
+    find = text.find
+    inside_string = False
+    last = begin
+    for m in BRACKET.finditer(text, begin, end):
+        pos = m.start()
+        # Brackets are inside a string after an odd number of quotes. In
+        # valid JSON no escape ends in a bracket, so every stretch between
+        # two brackets can be looked at on its own.
+        if find("\\", last, pos) == -1:
+            if count('"', last, pos) & 1:
+                inside_string = not inside_string
+        else:
+            for quote in QUOTE_OR_ESCAPE.finditer(text, last, pos):
+                if quote.group() == '"':
+                    inside_string = not inside_string
+        last = pos
+        if inside_string:
+            continue
+
+        if m.group() in "[{":
+            parents.append(stack[-1] if stack else -1)
+            stack.append(len(starts))
+            starts.append(pos)
+            ends.append(-1)
+        else:
+            ends[stack.pop()] = pos
+    return starts, ends, parents
+
+
+def common_prefix(a: str, b: str) -> int:
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix(a: str, b: str, limit: int) -> int:
+    low, high = 0, limit
+    len_a, len_b = len(a), len(b)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len_a - middle:len_a - low] == b[len_b - middle:len_b - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class IncrementalValidator:
+    """
+    loads(text) parses a whole document and raises on errors.
+    raw_decode(text, index) decodes the value starting at index and returns
+    it with the index where it ends. Both must check the same things, e.g.
+    use the same duplicate key hook.
+    """
+
+    def __init__(self, loads, raw_decode):
+        self.loads = loads
+        self.raw_decode = raw_decode
+        self.text = None
+        self.starts = self.ends = self.parents = None
+        self.full_parses = 0
+        self.partial_parses = 0
+
+    def validate(self, text: str):
+        """Raise the error of a full parse if text is not valid JSON"""
+        if self.text is not None and self.revalidate(text):
+            return
+        self.text = None
+        self.full_parses += 1
+        self.loads(text)
+        self.text = text
+        # indexed on the next change, which may never come
+        self.starts = self.ends = self.parents = None
+
+    def revalidate(self, text: str) -> bool:
+        old = self.text
+        if text == old:
+            return True
+
+        prefix = common_prefix(old, text)
+        suffix = common_suffix(old, text, min(len(old), len(text)) - prefix)
+        change_end = len(old) - suffix
+        if self.starts is None:
+            self.starts, self.ends, self.parents = index_containers(old)
+        starts, ends, parents = self.starts, self.ends, self.parents
+
+        # The innermost enclosing container is the last one opened before
+        # the change or one of its ancestors
+        index = bisect_left(starts, prefix) - 1
+        while index >= 0 and ends[index] < change_end:
+            index = parents[index]
+        if index < 0:
+            return False
+
+        delta = len(text) - len(old)
+        try:
+            _, stop = self.raw_decode(text, starts[index])
+        except Exception:
+            return False
+        if stop != ends[index] + delta + 1:
+            return False
+
+        self.partial_parses += 1
+        self.update_index(index, text, delta)
+        self.text = text
+        return True
+
+    def update_index(self, index: int, text: str, delta: int):
+        """Re-index the inside of the re-parsed container and shift the rest"""
+        starts, ends, parents = self.starts, self.ends, self.parents
+        following = bisect_left(starts, ends[index])
+        new_starts, new_ends, new_parents = index_containers(
+            text, starts[index] + 1, ends[index] + delta
+        )
+        shift = len(new_starts) - (following - index - 1)
+
+        ancestor = index
+        while ancestor >= 0:
+            ends[ancestor] += delta
+            ancestor = parents[ancestor]
+
+        self.starts = starts[:index + 1] + new_starts + array(
+            "q", [start + delta for start in starts[following:]]
+        )
+        self.ends = ends[:index + 1] + new_ends + array(
+            "q", [end + delta for end in ends[following:]]
+        )
+        self.parents = parents[:index + 1] + array(
+            "q", [index if parent < 0 else parent + index + 1 for parent in new_parents]
+        ) + array(
+            "q", [parent if parent <= index else parent + shift for parent in parents[following:]]
+        )
@@ -0,0 +1,271 @@
+import sys
+import os
+
+# parent folder holds libraries which needs to be included
+sys.path.append(os.path.realpath('../lib'))
+
+import simplejson as json
+from simplejson import OrderedDict
+from simplejson.fast_decoder import FastJSONDecoder
+
+import json2xml
+import baseline_encoder
+
+import argparse
+import decimal
+import random
+import time
+import tracemalloc
+from xml.etree import ElementTree as et
+
+
+def make_record(rnd):
+    return OrderedDict([
+        ("id", rnd.randint(0, 10 ** 9)),
+        ("name", "user-%d" % rnd.randint(0, 10 ** 6)),
+        ("active", rnd.random() > 0.5),
+        ("score", round(rnd.random() * 1000, 3)),
+        ("tags", ["tag%d" % rnd.randint(0, 50) for _ in range(rnd.randint(0, 5))]),
+        ("address", OrderedDict([
+            ("street", "%d Main Street" % rnd.randint(1, 999)),
+            ("zip", "%05d" % rnd.randint(0, 99999)),
+            ("geo", [rnd.uniform(-90, 90), rnd.uniform(-180, 180)]),
+        ])),
+        ("note", None),
+    ])
+
+
+def make_document(size_mb):
+    """Build a JSON text of roughly ``size_mb`` megabytes with a mix of
+    objects, arrays, strings and numbers"""
+    rnd = random.Random(0)
+    records = []
+    length = 0
+    while length < size_mb * 1024 * 1024:
+        record = json.dumps(make_record(rnd), indent=2)
+        records.append(record)
+        length += len(record) + 2
+    return "[\n" + ",\n".join(records) + "\n]"
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_decoder(document, repeat):
+    options = dict(object_pairs_hook=OrderedDict, parse_float=decimal.Decimal)
+    generic = json.JSONDecoder(**options)
+    fast = FastJSONDecoder(**options)
+    assert generic.raw_decode(document) == fast.raw_decode(document)
+
+    size = len(document) / (1024 * 1024)
+    generic_time = best_of(repeat, generic.raw_decode, document)
+    fast_time = best_of(repeat, fast.raw_decode, document)
+    print("decoder: %.1f MB" % size)
+    print("  JSONDecoder.raw_decode      %6.2fs  %6.1f MB/s" % (generic_time, size / generic_time))
+    print("  FastJSONDecoder.raw_decode  %6.2fs  %6.1f MB/s" % (fast_time, size / fast_time))
+    print("  speedup                     %6.2fx" % (generic_time / fast_time))
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def bench_reformat(document, repeat):
+    options = dict(indent=2, separators=(',', ': '), ensure_ascii=False, object_on_newline=True)
+
+    def decode_and_encode(document):
+        obj = json.loads(document, cls=FastJSONDecoder, object_pairs_hook=OrderedDict, raw_numbers=True)
+        return json.dumps(obj, **options)
+
+    def reformat(document):
+        return json.reformat(document, **options)
+
+    assert decode_and_encode(document) == reformat(document)
+
+    size = len(document) / (1024 * 1024)
+    tree_time = best_of(repeat, decode_and_encode, document)
+    token_time = best_of(repeat, reformat, document)
+    print("format: %.1f MB" % size)
+    print("  loads + dumps  %6.2fs  peak %7.1f MB" % (tree_time, peak_memory(decode_and_encode, document)))
+    print("  reformat       %6.2fs  peak %7.1f MB" % (token_time, peak_memory(reformat, document)))
+
+
+def bench_json2xml(document, repeat):
+    def traverse(element, json_dict):
+        # what the json2xml command used to do
+        if type(json_dict) is dict and json_dict.keys():
+            for key in json_dict.keys():
+                element.append(traverse(et.Element(key), json_dict[key]))
+        elif type(json_dict) is list:
+            items = et.Element("items")
+            for item in json_dict:
+                items.append(traverse(et.Element("item"), item))
+            element.append(items)
+        else:
+            element.set("value", str(json_dict))
+        return element
+
+    def tree(document):
+        root = traverse(et.Element("root"), json.loads(document))
+        return json2xml.XML_DECLARATION + et.tostring(root, "utf-8").decode("utf-8")
+
+    def stream(document):
+        return "".join(json2xml.iterxml(document))
+
+    assert tree(document) == stream(document)
+
+    size = len(document) / (1024 * 1024)
+    tree_time = best_of(repeat, tree, document)
+    stream_time = best_of(repeat, stream, document)
+    print("json2xml: %.1f MB" % size)
+    print("  ElementTree  %6.2fs  peak %7.1f MB" % (tree_time, peak_memory(tree, document)))
+    print("  iterxml      %6.2fs  peak %7.1f MB" % (stream_time, peak_memory(stream, document)))
+
+
+def break_document(document, count):
+    """Return the versions of ``document`` a user goes through when fixing
+    ``count`` missing commas one at a time, the most broken first"""
+    step = len(document) // (count + 1)
+    commas = [document.index(",", index * step) for index in range(1, count + 1)]
+    versions = []
+    for fixed in range(count):
+        chunks = []
+        last = 0
+        for comma in commas[fixed:]:
+            chunks.append(document[last:comma])
+            last = comma + 1
+        chunks.append(document[last:])
+        versions.append("".join(chunks))
+    return versions
+
+
+def bench_errors(document, repeat, count=20):
+    versions = break_document(document, count)
+    assert len(json.scan_errors(versions[0])) == count
+
+    def parse_per_error(versions):
+        # each validation shows the first error, which is then fixed
+        for version in versions:
+            try:
+                json.loads(version, cls=FastJSONDecoder)
+            except json.JSONDecodeError:
+                pass
+
+    size = len(document) / (1024 * 1024)
+    parses_time = best_of(repeat, parse_per_error, versions)
+    scan_time = best_of(repeat, json.scan_errors, versions[0])
+    print("errors: %.1f MB, %d errors" % (size, count))
+    print("  one parse per error  %6.2fs" % parses_time)
+    print("  scan_errors          %6.2fs" % scan_time)
+
+
+def make_lines(count):
+    """Build a JSON Lines text of ``count`` records"""
+    rnd = random.Random(0)
+    return "\n".join(json.dumps(make_record(rnd)) for _ in range(count))
+
+
+def bench_lines(text, repeat):
+    options = dict(indent=2, separators=(',', ': '), ensure_ascii=False, object_on_newline=True)
+
+    def per_line(text):
+        # one decode, encode and write per line, as the command used to do
+        lines = text.split("\n")
+        for index in reversed(range(len(lines))):
+            obj = json.loads(lines[index], object_pairs_hook=OrderedDict, raw_numbers=True)
+            lines[index] = json.dumps(obj, **options)
+        return "\n".join(lines)
+
+    def joined(text):
+        return "\n".join([json.reformat(line, **options) for line in text.split("\n")])
+
+    assert per_line(text) == joined(text)
+
+    count = text.count("\n") + 1
+    per_line_time = best_of(repeat, per_line, text)
+    joined_time = best_of(repeat, joined, text)
+    print("JSON Lines: %d lines" % count)
+    print("  loads + dumps per line  %6.2fs  %8.0f lines/s" % (per_line_time, count / per_line_time))
+    print("  reformat and join       %6.2fs  %8.0f lines/s" % (joined_time, count / joined_time))
+    print("  speedup                 %6.2fx" % (per_line_time / joined_time))
+
+
+def bench_cached_lines(text, repeat):
+    decode_options = dict(cls=FastJSONDecoder, object_pairs_hook=OrderedDict, parse_float=json.RawJSON)
+    encode_options = dict(indent=2, separators=(',', ': '), ensure_ascii=False, sort_keys=True)
+
+    def per_call(lines):
+        # a new decoder and encoder for every line
+        return [json.dumps(json.loads(line, **decode_options), **encode_options) for line in lines]
+
+    def cached(lines):
+        return [json.get_encoder(**encode_options).encode(json.get_decoder(**decode_options).decode(line))
+                for line in lines]
+
+    lines = text.split("\n")
+    assert per_call(lines) == cached(lines)
+
+    count = len(lines)
+    per_call_time = best_of(repeat, per_call, lines)
+    cached_time = best_of(repeat, cached, lines)
+    print("JSON Lines decode and encode: %d lines" % count)
+    print("  loads + dumps           %6.2fs  %8.0f lines/s" % (per_call_time, count / per_call_time))
+    print("  get_decoder/get_encoder %6.2fs  %8.0f lines/s" % (cached_time, count / cached_time))
+    print("  speedup                 %6.2fx" % (per_call_time / cached_time))
+
+
+def make_deep(depth):
+    """Build a JSON text of objects and arrays nested ``depth`` levels deep"""
+    return '{"a": [' * (depth // 2) + "1" + "]}" * (depth // 2)
+
+
+def bench_deep(repeat, depths=(400, 10000)):
+    def encode(iterencode, obj):
+        # iterencode is what writes formatted output into the view
+        return "".join(iterencode(obj))
+
+    print("deep documents:")
+    for depth in depths:
+        text = make_deep(depth)
+        obj = json.loads(text, cls=FastJSONDecoder)
+        print("  depth %d" % depth)
+        # simplejson used to nest one generator per level, so every chunk
+        # passed through all of them
+        for name, iterencode in (("nested generators", baseline_encoder.iterencode),
+                                 ("explicit stack", json.JSONEncoder().iterencode)):
+            try:
+                assert encode(iterencode, obj) == text
+                print("    %-17s  %6.3fs" % (name, best_of(repeat, encode, iterencode, obj)))
+            except RecursionError:
+                print("    %-17s  RecursionError" % name)
+        xml_time = best_of(repeat, lambda text: "".join(json2xml.iterxml(text)), text)
+        print("    iterxml            %6.3fs" % xml_time)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pretty JSON benchmarks")
+    parser.add_argument("--size", type=float, default=10, help="document size in MB")
+    parser.add_argument("--lines", type=int, default=500000, help="JSON Lines record count")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    document = make_document(args.size)
+    bench_decoder(document, args.repeat)
+    bench_reformat(document, args.repeat)
+    bench_errors(document, args.repeat)
+    bench_json2xml(document, args.repeat)
+    lines = make_lines(args.lines)
+    bench_lines(lines, args.repeat)
+    bench_cached_lines(lines, args.repeat)
+    bench_deep(args.repeat)
@@ -7,6 +7,11 @@ sys.path.append(os.path.realpath('../lib'))
 import simplejson as json
 from simplejson import OrderedDict
 
+import jqlite
+import json2xml
+from selection import select_spans
+from validator import IncrementalValidator
+
 import decimal
 import unittest
 
@@ -78,6 +83,289 @@ class TestIssues(unittest.TestCase):
                              use_decimal=True)
         self.assertEqual(tmp_str, expected_output)
 
+    def test_keep_arrays_single_line(self):
+        tmp_str = '{"flat": [1, 2, 3], "objects": [{"a": 1, "b": 2}], "nested": [[1], ["x"]],' \
+                  ' "long": ["aaaaaaaaaa", "bbbbbbbbbb"]}'
+        expected_output = '''{
+  "flat": [1,2,3],
+  "objects": [{"a": 1,"b": 2}],
+  "nested": [
+    [1],
+    ["x"]
+  ],
+  "long": [
+    "aaaaaaaaaa",
+    "bbbbbbbbbb"
+  ]
+}'''
+        obj = json.loads(tmp_str, object_pairs_hook=OrderedDict, parse_float=decimal.Decimal)
+        tmp_str = json.dumps(obj, indent=2, ensure_ascii=False, sort_keys=False,
+                             separators=(',', ': '),
+                             use_decimal=True, array_line_length=20)
+        self.assertEqual(tmp_str, expected_output)
+
+    def test_brace_and_bracket_newline(self):
+        tmp_str = '{"obj": {"a": 1}, "arr": [1], "empty": {}, "value": 2}'
+        expected_output = '''{
+  "obj":
+  {
+    "a": 1
+  },
+  "arr":
+  [
+    1
+  ],
+  "empty":
+  {},
+  "value": 2
+}'''
+        obj = json.loads(tmp_str, object_pairs_hook=OrderedDict, parse_float=decimal.Decimal)
+        tmp_str = json.dumps(obj, indent=2, ensure_ascii=False, sort_keys=False,
+                             separators=(',', ': '),
+                             use_decimal=True, object_on_newline=True, array_on_newline=True)
+        self.assertEqual(tmp_str, expected_output)
+
+    def test_fast_decoder(self):
+        tmp_str = '{"a": [1, 2.50, {"b": "\\u2022\\n", "c": null}], "d": {"e": [[], {}]}, "f": true}'
+        expected = json.loads(tmp_str, object_pairs_hook=OrderedDict, parse_float=decimal.Decimal)
+        obj = json.loads(tmp_str, cls=json.FastJSONDecoder, object_pairs_hook=OrderedDict,
+                         parse_float=decimal.Decimal)
+        self.assertEqual(obj, expected)
+        self.assertEqual(str(obj['a'][1]), '2.50')
+
+    def test_fast_decoder_errors(self):
+        tmp_str = '{"a": [1, 2,], "b": 3}'
+        with self.assertRaises(json.JSONDecodeError) as expected:
+            json.loads(tmp_str, object_pairs_hook=OrderedDict)
+        with self.assertRaises(json.JSONDecodeError) as error:
+            json.loads(tmp_str, cls=json.FastJSONDecoder, object_pairs_hook=OrderedDict)
+        self.assertEqual(str(error.exception), str(expected.exception))
+
+    def test_raw_numbers(self):
+        tmp_str = '{"test1":0.99, "test2":"1.99", "test3":1.00000000001, "test5":1,' \
+                  ' "test6":4.589999999999999999, "test7":1.0, "test8":1E400, "test9":-0}'
+        expected_output = '''{
+  "test1": 0.99,
+  "test2": "1.99",
+  "test3": 1.00000000001,
+  "test5": 1,
+  "test6": 4.589999999999999999,
+  "test7": 1.0,
+  "test8": 1E400,
+  "test9": -0
+}'''
+        for cls in (None, json.FastJSONDecoder):
+            obj = json.loads(tmp_str, cls=cls, object_pairs_hook=OrderedDict, raw_numbers=True)
+            self.assertIsInstance(obj['test7'], json.RawJSON)
+            self.assertEqual(obj['test7'].encoded_json, '1.0')
+            tmp_str_out = json.dumps(obj, indent=2, ensure_ascii=False, sort_keys=False,
+                                     separators=(',', ': '))
+            self.assertEqual(tmp_str_out, expected_output)
+
+    def test_reformat(self):
+        tmp_str = '{"a": [1, 2.50, {"b": "\\u2022\\n", "c": null}], "d": {"e": [[], {}]}, "f": -0}'
+        obj = json.loads(tmp_str, object_pairs_hook=OrderedDict, raw_numbers=True)
+        for options in (dict(indent=2, separators=(',', ': '), object_on_newline=True),
+                        dict(separators=(',', ':'), ensure_ascii=False)):
+            self.assertEqual(json.reformat(tmp_str, **options), json.dumps(obj, **options))
+        with self.assertRaises(json.JSONDecodeError) as expected:
+            json.loads('{"a": [1, 2,]}')
+        with self.assertRaises(json.JSONDecodeError) as error:
+            json.reformat('{"a": [1, 2,]}', indent=2)
+        self.assertEqual(str(error.exception), str(expected.exception))
+
+    def test_jqlite(self):
+        tmp_str = '{"items": [{"n": 1, "ok": true}, {"n": 5, "ok": false}, {"n": 2.5}], "z": null}'
+        obj = json.loads(tmp_str, object_pairs_hook=OrderedDict, raw_numbers=True)
+        queries = {
+            '.items[] | select(.n > 2) | .n': ['5', '2.5'],
+            '.items | map(.ok)': ['[true, false, null]'],
+            '[.items[-1].n, .z.a] | length': ['2'],
+            '.items[0] | keys': ['["n", "ok"]'],
+            '.["z"], (.items | length) >= 3 and true': ['null', 'true'],
+        }
+        for query, expected in queries.items():
+            self.assertEqual([json.dumps(result) for result in jqlite.compile(query)(obj)], expected)
+
+        with self.assertRaises(jqlite.JqError):
+            list(jqlite.compile('.items.n')(obj))
+        for query in ('.. | numbers', '.items[1:]', '.a?', '.items |'):
+            with self.assertRaises(jqlite.UnsupportedQuery):
+                jqlite.compile(query)
+
+    def test_incremental_validator(self):
+        def duplicate_key_hook(pairs):
+            result = OrderedDict()
+            for key, val in pairs:
+                if key in result:
+                    raise KeyError("Duplicate key specified: %s" % key)
+                result[key] = val
+            return result
+
+        decoder = json.JSONDecoder(object_pairs_hook=duplicate_key_hook)
+        validator = IncrementalValidator(decoder.decode, decoder.raw_decode)
+        versions = [
+            '{"a": [1, {"b": "]"}], "c": {"d": [true]}, "e": "x"}',
+            '{"a": [1, {"b": "]", "f": 2}], "c": {"d": [true]}, "e": "x"}',
+            '{"a": [1, {"b": "]", "f": 2}], "c": {"d": [true, [], {}]}, "e": "x"}',
+            '{"a": [1, {"b": "]", "f": 2}], "c": {"d": [true, [], {"d": 1, "d": 2}]}, "e": "x"}',
+            '{"a": [1, {"b": "]", "f": 2}], "c": {"d": [true, [, {}]}, "e": "x"}',
+            '{"a": [1, {"b": "]", "f": 2}], "c": {"d": [true, [], {}]}, "e": "x"}',
+            '{"a": [1, {"b": "\\"]", "f": 2}], "c": {"d": [true, [], {}]}, "e": "x"}',
+        ]
+        for text in versions:
+            try:
+                decoder.decode(text)
+                expected = None
+            except Exception as ex:
+                expected = str(ex)
+            try:
+                validator.validate(text)
+                error = None
+            except Exception as ex:
+                error = str(ex)
+            self.assertEqual(error, expected)
+        self.assertEqual(validator.partial_parses, 3)
+
+    def test_select_spans(self):
+        tmp_str = '{"a":1,"b":[1,2]}'
+        # two cursors select nothing, rather than the whole file twice
+        self.assertEqual(select_spans([(3, 3), (9, 9)], len(tmp_str)), [])
+        self.assertEqual(select_spans([(3, 3)], len(tmp_str)), [(0, len(tmp_str), True)])
+        self.assertEqual(select_spans([(3, 3)], len(tmp_str), use_entire_file=False), [(3, 3, False)])
+        self.assertEqual(select_spans([(11, 16), (3, 3), (0, 17), (11, 16)], len(tmp_str)),
+                         [(0, 17, False)])
+        self.assertEqual(select_spans([(11, 16), (5, 6), (6, 6), (5, 6)], len(tmp_str)),
+                         [(5, 6, False), (11, 16, False)])
+
+    def test_select_spans_json_lines(self):
+        tmp_str = '{"a":1}\n{"b":[1,2]}\n{"c":null}'
+        self.assertEqual(select_spans([(2, 2), (10, 10), (25, 25)], len(tmp_str)), [])
+
+        # each selected block of lines is formatted once, the later one first
+        spans = select_spans([(20, 30), (0, 7), (2, 5), (20, 30)], len(tmp_str))
+        self.assertEqual(spans, [(0, 7, False), (20, 30, False)])
+        for begin, end, _ in reversed(spans):
+            lines = tmp_str[begin:end].split('\n')
+            output = '\n'.join(json.reformat(line, separators=(',', ': ')) for line in lines)
+            tmp_str = tmp_str[:begin] + output + tmp_str[end:]
+        self.assertEqual(tmp_str, '{"a": 1}\n{"b":[1,2]}\n{"c": null}')
+
+    def test_scan_errors(self):
+        tmp_str = '{"a": [1 2, 3], "b": tru, "c": {"d" 1}, "a": "x\\q", "e": [1,,2]}'
+        for text in (tmp_str, '[1, {"a": 2}', '{"a": 1} 2', '"\\u00"'):
+            with self.assertRaises(json.JSONDecodeError) as expected:
+                json.loads(text)
+            first = json.scan_errors(text)[0]
+            self.assertEqual(str(first), str(expected.exception))
+
+        errors = json.scan_errors(tmp_str, check_duplicates=True)
+        self.assertEqual([(error.msg, error.pos) for error in errors], [
+            ("Expecting ',' delimiter or ']'", 9),
+            ('Expecting value', 21),
+            ("Expecting ':' delimiter", 36),
+            ('Duplicate key specified: a', 40),
+            ('Invalid \\X escape sequence %r', 48),
+            ('Expecting value', 60),
+        ])
+        self.assertEqual(len(json.scan_errors(tmp_str, max_errors=2)), 2)
+        self.assertEqual(json.scan_errors('{"a": [1, 2.5e3, {"b": "\\n"}], "c": null}'), [])
+
+    def test_locate_keys(self):
+        tmp_str = '{"a": {"b\\u00e9": [1, {"a": 2}]},\n "c": {}, "a": 3}'
+        for cls in (None, json.FastJSONDecoder):
+            obj = json.loads(tmp_str, cls=cls, object_pairs_hook=list, locate_keys=True)
+            self.assertEqual(obj, json.loads(tmp_str, object_pairs_hook=list))
+            located = [obj[0][0], obj[0][1][0][0], obj[0][1][0][1][1][0][0], obj[1][0], obj[2][0]]
+            self.assertTrue(all(isinstance(key, json.LocatedKey) for key in located))
+            self.assertEqual([tmp_str[key.offset:key.end] for key in located],
+                             ['"a"', '"b\\u00e9"', '"a"', '"c"', '"a"'])
+
+        # string items of arrays are located as well, apart from equal keys
+        tmp_str = '{"a": [{"x": 1}, "x", 2, "\\u0078", ["x"]]}'
+        for cls in (None, json.FastJSONDecoder):
+            items = json.loads(tmp_str, cls=cls, object_pairs_hook=list, locate_keys=True)[0][1]
+            located = [items[1], items[3], items[4][0]]
+            self.assertTrue(all(isinstance(item, json.LocatedKey) for item in located))
+            self.assertEqual([(item.offset, item.end) for item in located], [(17, 20), (25, 33), (36, 39)])
+            self.assertNotIsInstance(items[2], json.LocatedKey)
+
+    def test_json2xml(self):
+        tmp_str = '{"a": {"b": 1.50, "c": [true, null, [], {}]}, "d": "x<\\"y\\">", "e": {}}'
+        expected = (json2xml.XML_DECLARATION +
+                    '<root><a><b value="1.5" /><c><items><item value="True" />'
+                    '<item value="None" /><item><items /></item><item value="{}" />'
+                    '</items></c></a><d value="x&lt;&quot;y&quot;&gt;" /><e value="{}" /></root>')
+        self.assertEqual(''.join(json2xml.iterxml(tmp_str, chunk_size=2)), expected)
+        self.assertEqual(''.join(json2xml.iterxml('[]')),
+                         json2xml.XML_DECLARATION + '<root><items /></root>')
+        with self.assertRaises(json2xml.UnsupportedDocument):
+            ''.join(json2xml.iterxml('{"{uri}a": 1}'))
+        with self.assertRaises(json2xml.UnsupportedDocument):
+            ''.join(json2xml.iterxml('{"a": {"{b": 1}}'))
+        with self.assertRaises(json.JSONDecodeError):
+            ''.join(json2xml.iterxml('{"a": [1, 2,]}'))
+
+    def test_deep_encode(self):
+        depth = 10000
+        tmp_str = '{"a": [' * depth + '1' + ']}' * depth
+        obj = json.loads(tmp_str, cls=json.FastJSONDecoder)
+        self.assertEqual(''.join(json.JSONEncoder().iterencode(obj)), tmp_str)
+        self.assertEqual(json.dumps(obj, indent='', separators=(',', ':')).count('\n'), depth * 4)
+        nested = [1, [2, [3]]]
+        self.assertEqual(json.dumps(nested, indent=2, array_line_length=10),
+                         '[\n  1,\n  [\n    2,\n    [3]\n  ]\n]')
+        nested[1][1].append(nested)
+        with self.assertRaises(ValueError):
+            json.dumps(nested, indent=2)
+
+    def test_cached_coders(self):
+        tmp_str = '{"b": 1.50, "a": [true, null]}'
+        options = dict(cls=json.FastJSONDecoder, object_pairs_hook=OrderedDict, parse_float=decimal.Decimal)
+        decoder = json.get_decoder(**options)
+        self.assertIs(json.get_decoder(**options), decoder)
+        self.assertEqual(decoder.decode(tmp_str), json.loads(tmp_str, **options))
+        self.assertIsNot(json.get_decoder(cls=json.FastJSONDecoder), decoder)
+
+        encoder = json.get_encoder(indent=2, separators=(',', ': '), sort_keys=True)
+        self.assertIs(json.get_encoder(sort_keys=True, separators=(',', ': '), indent=2), encoder)
+        obj = decoder.decode(tmp_str)
+        self.assertEqual(encoder.encode(obj), json.dumps(obj, indent=2, separators=(',', ': '), sort_keys=True))
+        # options that cannot be hashed still work, uncached
+        self.assertEqual(json.get_encoder(separators=[',', ':']).encode([1, 2]), '[1,2]')
+        # the least recently used one is dropped first
+        oldest = json.get_encoder(indent=0)
+        for indent in range(1, 40):
+            self.assertIs(json.get_encoder(indent=2, separators=(',', ': '), sort_keys=True), encoder)
+            json.get_encoder(indent=indent)
+        self.assertIsNot(json.get_encoder(indent=0), oldest)
+
+    def test_scan_bytes_errors(self):
+        tmp_str = '{\n  "a": "\u00e9\u20ac",\n  "b": [1 2],\n  "c": "x\\qy",\n  "d": "\u00e9" "e"\n}'
+        data = tmp_str.encode('utf-8')
+        errors = json.scan_bytes_errors(data)
+        expected = json.scan_errors(tmp_str)
+        self.assertEqual([(e.msg, e.lineno, e.colno) for e in errors],
+                         [(e.msg, e.lineno, e.colno) for e in expected])
+        self.assertEqual(errors[0].pos, data.index(b'2'))
+        self.assertEqual(json.scan_bytes_errors(b'{"a": ["\xff"]}')[0].msg, 'Invalid UTF-8 byte at')
+        self.assertEqual(json.scan_bytes_errors(b'\xef\xbb\xbf[1, {"a": [true, null]}]'), [])
+        # several errors on one line count the characters in between once
+        tmp_str = '["\u00e9" 1, "\u20ac" 2, {"\u00e9": tru}, "x\\q"]'
+        self.assertEqual([(e.msg, e.lineno, e.colno) for e in json.scan_bytes_errors(tmp_str.encode('utf-8'))],
+                         [(e.msg, e.lineno, e.colno) for e in json.scan_errors(tmp_str)])
+
+        lines = b'{"a": 1}\n\n[1, 2\n"x"\n{"b": tru}\n'
+        self.assertEqual([(e.lineno, e.colno) for e in json.scan_bytes_errors(lines, lines=True)],
+                         [(3, 6), (5, 7)])
+        self.assertEqual(len(json.scan_bytes_errors(lines, max_errors=1, lines=True)), 1)
+
+        # progress is reported within one long string or array
+        for data in ['["' + 'é' * 50000 + '"]', '[' + '1, ' * 50000 + '1]']:
+            reached = []
+            json.scan_bytes_errors(data.encode('utf-8'), progress=reached.append, progress_step=4096)
+            self.assertGreater(len(reached), 10)
+
 
 if __name__ == '__main__':
     unittest.main()